@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# Software License Agreement (GNU GPLv3  License)
+#
+# Copyright (c) 2022, Roland Jung (rolandjung0@gmail.com)
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Requirements:
+# sudo pip install Pillow tqdm argparse
+#
+# Checks that the memory of a batched run does not grow with the number of files: runs a tool with a small
+# --batch_size on a corpus of N and of factor * N images and fails if the peak RSS (VmHWM) of the larger run exceeds
+# the one of the smaller run by more than the tolerance.
+
+import os
+import shutil
+import tempfile
+import argparse
+
+from corpus import generate_corpus, exit_success, exit_failure
+from run_benchmark import TOOLS, run_end_to_end
+
+
+def measure(tool, count, batch_size, work_dir, verbose=False):
+    # returns the peak RSS (kB) of a run of tool on a corpus of count tiny images
+    fmt = TOOLS[tool][1]
+    corpus_dir = os.path.join(work_dir, 'corpus_%d' % count)
+    generate_corpus(corpus_dir, count, fmt, 16, 16, verbose=verbose)
+    try:
+        result = run_end_to_end(tool, 'batch_size %d' % batch_size, ['--batch_size', str(batch_size)], corpus_dir,
+                                fmt, work_dir)
+    finally:
+        shutil.rmtree(corpus_dir)
+    if result['returncode'] != 0 or result['peak_rss_kb'] is None:
+        raise RuntimeError("%s failed on %d files (returncode %d)" % (tool, count, result['returncode']))
+    return result['peak_rss_kb']
+
+
+# --count 500 --factor 10 --batch_size 50
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Checks that the peak RSS of a batched run does not grow with the number of files:\n usage: --count 500 --factor 10 --batch_size 50')
+    parser.add_argument('--tool', help='tool to run (rename_file)', default='rename_file',
+                        choices=['rename_img', 'rename_file'])
+    parser.add_argument('--count', help='number of images of the small corpus (N)', type=int, default=500)
+    parser.add_argument('--factor', help='the large corpus has factor * N images', type=int, default=10)
+    parser.add_argument('--batch_size', help='--batch_size of the runs', type=int, default=50)
+    parser.add_argument('--tolerance', help='allowed growth of the peak RSS, relative', type=float, default=0.1)
+    parser.add_argument('--work_dir', help='directory for the corpora and outputs (temporary)', default="")
+    parser.add_argument('--verbose', action='store_true', help='verbose', default=False)
+    args = parser.parse_args()
+
+    if args.count < 1 or args.factor < 2 or args.batch_size < 1:
+        print("invalid --count, --factor or --batch_size")
+        exit_failure()
+
+    work_dir = args.work_dir if args.work_dir != "" else tempfile.mkdtemp()
+    if not os.path.exists(work_dir):
+        os.makedirs(work_dir)
+    try:
+        peak_small = measure(args.tool, args.count, args.batch_size, work_dir, args.verbose)
+        peak_large = measure(args.tool, args.count * args.factor, args.batch_size, work_dir, args.verbose)
+    except RuntimeError as e:
+        print(e)
+        exit_failure()
+    finally:
+        if args.work_dir == "":
+            shutil.rmtree(work_dir)
+
+    growth = float(peak_large - peak_small) / peak_small
+    print("peak RSS: %d kB with %d files, %d kB with %d files (%+.1f%%, tolerance %.1f%%)"
+          % (peak_small, args.count, peak_large, args.count * args.factor, growth * 100, args.tolerance * 100))
+    if growth > args.tolerance:
+        print("the peak RSS grows with the number of files")
+        exit_failure()
+    exit_success()
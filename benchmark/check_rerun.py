@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# Software License Agreement (GNU GPLv3  License)
+#
+# Copyright (c) 2022, Roland Jung (rolandjung0@gmail.com)
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Requirements:
+# sudo pip install Pillow tqdm argparse
+#
+# Checks that a repeated import with --skip_duplicates adds nothing to the output_dir: runs rename-img twice on the
+# same synthetic corpus into the same output_dir, with and without --write_exif, and fails if the second run writes
+# any file.
+
+import os
+import sys
+import shutil
+import tempfile
+import argparse
+import subprocess
+
+from corpus import generate_corpus, exit_success, exit_failure
+from run_benchmark import TOOLS
+
+VARIANTS = [('copy', []), ('write_exif', ['--write_exif', '--add_hours', '2'])]
+
+
+def count_files(dir):
+    # the results in dir, without the journal, index and temporary files
+    return sum(len([name for name in files if not name.startswith('.')]) for root, dirs, files in os.walk(dir))
+
+
+def import_twice(corpus_dir, output_dir, extra_args):
+    # returns the number of files in output_dir after the first and after the second run
+    script = TOOLS['rename_img'][0]
+    cmd = [sys.executable, script, '--input_dir', corpus_dir, '--output_dir', output_dir, '--ext', 'jpg',
+           '--skip_duplicates'] + extra_args
+    counts = []
+    for i in range(2):
+        if subprocess.call(cmd, stdout=subprocess.DEVNULL) != 0:
+            raise RuntimeError("run %d failed: %s" % (i + 1, ' '.join(cmd)))
+        counts.append(count_files(output_dir))
+    return counts
+
+
+# --count 40 --duplicate_ratio 0.3
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Checks that a repeated import with --skip_duplicates adds no files:\n usage: --count 40 --duplicate_ratio 0.3')
+    parser.add_argument('--count', help='number of images', type=int, default=40)
+    parser.add_argument('--duplicate_ratio', help='share of byte identical copies', type=float, default=0.3)
+    parser.add_argument('--work_dir', help='directory for the corpus and outputs (temporary)', default="")
+    parser.add_argument('--verbose', action='store_true', help='verbose', default=False)
+    args = parser.parse_args()
+
+    work_dir = args.work_dir if args.work_dir != "" else tempfile.mkdtemp()
+    if not os.path.exists(work_dir):
+        os.makedirs(work_dir)
+    failed = False
+    try:
+        corpus_dir = os.path.join(work_dir, 'corpus')
+        generate_corpus(corpus_dir, args.count, 'jpg', 64, 48, duplicate_ratio=args.duplicate_ratio,
+                        verbose=args.verbose)
+        for variant, extra_args in VARIANTS:
+            first, second = import_twice(corpus_dir, os.path.join(work_dir, 'out_' + variant), extra_args)
+            print("%s: %d files after the first run, %d after the second" % (variant, first, second))
+            if second != first:
+                failed = True
+    except RuntimeError as e:
+        print(e)
+        failed = True
+    finally:
+        if args.work_dir == "":
+            shutil.rmtree(work_dir)
+
+    if failed:
+        print("the second run imported files again")
+        exit_failure()
+    exit_success()
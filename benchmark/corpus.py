@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# Software License Agreement (GNU GPLv3  License)
+#
+# Copyright (c) 2022, Roland Jung (rolandjung0@gmail.com)
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Requirements:
+# sudo pip install Pillow tqdm argparse  (pillow-heif for HEIC corpora)
+
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+from datetime import datetime
+from datetime import timedelta
+from PIL import Image
+from tqdm import tqdm
+
+TAG_DATETIME = 0x0132
+TAG_EXIF_IFD = 0x8769
+TAG_DATETIME_ORIGINAL = 0x9003
+PATCH_SIZE = 32
+
+
+def exit_success():
+    print("#########################   SUCCESS   #######################")
+    sys.exit(0)
+
+
+def exit_failure():
+    print("#########################   FAILURE   #######################")
+    sys.exit(1)
+
+
+def make_exif(datetime_object):
+    exif = Image.Exif()
+    datetime_str = datetime_object.strftime('%Y:%m:%d %H:%M:%S')
+    exif[TAG_DATETIME] = datetime_str
+    exif.get_ifd(TAG_EXIF_IFD)[TAG_DATETIME_ORIGINAL] = datetime_str
+    return exif
+
+
+def generate_corpus(dir, count, fmt='jpg', width=1024, height=768, quality=90, exif_ratio=1.0, duplicate_ratio=0.0,
+                    burst_ratio=0.0, seed=0, verbose=False):
+    """
+    Writes <count> synthetic photos into dir: noise images with a unique patch each, EXIF timestamps for a share of
+    exif_ratio, byte identical copies for a share of duplicate_ratio and equal timestamps (burst shots) for a share
+    of burst_ratio. The mtime of every file is set to its timestamp. Returns the list of written files.
+    """
+    if width < 1 or height < 1:
+        raise ValueError("invalid image size %dx%d" % (width, height))
+    rnd = random.Random(seed)
+    if fmt == 'heic':
+        import pillow_heif
+        pillow_heif.register_heif_opener()
+    save_format = {'jpg': 'JPEG', 'heic': 'HEIF'}[fmt]
+
+    if not os.path.exists(dir):
+        os.makedirs(dir)
+
+    base = Image.frombytes('RGB', (width, height), rnd.randbytes(width * height * 3)
+                           if hasattr(rnd, 'randbytes') else os.urandom(width * height * 3))
+    patch_size = min(PATCH_SIZE, width, height)
+    t_start = datetime(2022, 1, 1)
+    datetime_object = t_start
+    file_list = []
+    for i in tqdm(range(count), unit="files", disable=not verbose):
+        fn = os.path.join(dir, "IMG_%06d.%s" % (i, fmt.upper()))
+        if file_list and rnd.random() < duplicate_ratio:
+            shutil.copy2(rnd.choice(file_list), fn)
+            file_list.append(fn)
+            continue
+
+        if not file_list or rnd.random() >= burst_ratio:
+            datetime_object = t_start + timedelta(seconds=rnd.randrange(365 * 24 * 3600))
+
+        # a unique patch makes the content of every image unique (the whole image if it is smaller than the patch):
+        img = base.copy()
+        patch = Image.new('RGB', (patch_size, patch_size), (rnd.randrange(256), rnd.randrange(256), rnd.randrange(256)))
+        img.paste(patch, (rnd.randrange(width - patch_size + 1), rnd.randrange(height - patch_size + 1)))
+
+        params = {'quality': quality}
+        if rnd.random() < exif_ratio:
+            params['exif'] = make_exif(datetime_object)
+        img.save(fn, save_format, **params)
+
+        mtime = time.mktime(datetime_object.timetuple())
+        os.utime(fn, (mtime, mtime))
+        file_list.append(fn)
+    return file_list
+
+
+# --output_dir /tmp/corpus --count 1000 --format jpg --exif_ratio 0.9 --duplicate_ratio 0.1
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Generates a synthetic photo corpus for the benchmarks:\n usage: --output_dir /tmp/corpus --count 1000 --format jpg --duplicate_ratio 0.1')
+    parser.add_argument('--output_dir', help='directory for the generated images', default="")
+    parser.add_argument('--count', help='number of images', type=int, default=100)
+    parser.add_argument('--format', help='image format', default='jpg', choices=['jpg', 'heic'])
+    parser.add_argument('--width', help='image width', type=int, default=1024)
+    parser.add_argument('--height', help='image height', type=int, default=768)
+    parser.add_argument('--quality', help='encoder quality', type=int, default=90)
+    parser.add_argument('--exif_ratio', help='share of images with EXIF timestamps', type=float, default=1.0)
+    parser.add_argument('--duplicate_ratio', help='share of byte identical copies', type=float, default=0.0)
+    parser.add_argument('--burst_ratio', help='share of images with the timestamp of the previous one', type=float,
+                        default=0.0)
+    parser.add_argument('--seed', help='random seed', type=int, default=0)
+    parser.add_argument('--verbose', action='store_true', help='verbose', default=False)
+    args = parser.parse_args()
+
+    if args.output_dir == "":
+        print('no output_dir specified!')
+        exit_failure()
+    if args.width < 1 or args.height < 1:
+        print('invalid image size: %dx%d' % (args.width, args.height))
+        exit_failure()
+
+    file_list = generate_corpus(args.output_dir, args.count, args.format, args.width, args.height, args.quality,
+                                args.exif_ratio, args.duplicate_ratio, args.burst_ratio, args.seed, args.verbose)
+    print("generated files: %d" % len(file_list))
+    exit_success()
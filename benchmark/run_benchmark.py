@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+# Software License Agreement (GNU GPLv3  License)
+#
+# Copyright (c) 2022, Roland Jung (rolandjung0@gmail.com)
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Requirements:
+# sudo pip install Pillow tqdm argparse  (pillow-heif for the convert benchmark)
+#
+# Runs the tools on synthetic corpora, per stage (discovery, metadata, naming, transfer) in-process and end-to-end
+# as subprocesses in a sequential and a parallel variant. The results (files/s, MB/s, peak RSS) are written as JSON.
+# The peak RSS of a stage is its own (the peak is reset before every stage, Linux only); the end-to-end runs report
+# the peak of the tool process and, separately, the largest peak of its worker processes (convert --jobs).
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import subprocess
+from datetime import datetime
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT_DIR)
+from corpus import generate_corpus, exit_success, exit_failure
+from py_image_modifier.discovery import parse_extensions, scan_files
+from py_image_modifier.converter import get_converter, convert_file
+from py_image_modifier.transfer import transfer_file
+from py_image_modifier.naming import NameAllocator
+from py_image_modifier.rename_img import get_datatime_and_source_from_image
+
+TOOLS = {
+    'convert': (os.path.join(ROOT_DIR, 'convert', 'convert_heic2jpg.py'), 'heic'),
+    'rename_img': (os.path.join(ROOT_DIR, 'rename', 'rename_img_2_timestamp.py'), 'jpg'),
+    'rename_file': (os.path.join(ROOT_DIR, 'rename', 'rename_file_2_timestamp.py'), 'jpg'),
+}
+
+
+# runs a script and reports its own peak RSS and the largest peak RSS of its (finished) worker processes;
+# ru_maxrss of a spawned child may include the RSS of the parent
+LAUNCHER = """
+import sys, runpy, resource
+sys.path.insert(0, sys.argv[1])
+try:
+    sys.argv = sys.argv[2:]
+    runpy.run_path(sys.argv[0], run_name='__main__')
+finally:
+    peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    try:
+        with open('/proc/self/status') as f:
+            peak_rss_kb = int([line for line in f if line.startswith('VmHWM:')][0].split()[1])
+    except (OSError, IndexError):
+        pass
+    sys.stderr.write('\\npeak_rss_kb=%d\\n' % peak_rss_kb)
+    sys.stderr.write('workers_peak_rss_kb=%d\\n' % resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+"""
+
+
+def reset_peak_rss():
+    # sets the peak RSS (VmHWM) of this process to its current RSS; returns False if the kernel does not support it
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def get_stage_peak_rss_kb(reset):
+    # returns the peak RSS since reset_peak_rss() or None; ru_maxrss cannot be reset and would be the peak of all
+    # stages so far
+    if not reset:
+        return None
+    try:
+        with open('/proc/self/status') as f:
+            return int([line for line in f if line.startswith('VmHWM:')][0].split()[1])
+    except (OSError, IndexError):
+        return None
+
+
+def make_result(duration, num_files, num_bytes, peak_rss_kb):
+    duration = max(duration, 1e-9)
+    return {'seconds': round(duration, 4), 'files': num_files, 'files_per_s': round(num_files / duration, 2),
+            'mb_per_s': round(num_bytes / duration / 1e6, 2), 'peak_rss_kb': peak_rss_kb}
+
+
+def get_mtime_datetime(fn):
+    return datetime.fromtimestamp(os.path.getmtime(fn)), 'mtime'
+
+
+def make_name(datetime_str, file_ext, number):
+    if number == 0:
+        return "IMG_" + datetime_str + file_ext
+    return "IMG_" + str(number) + "_" + datetime_str + file_ext
+
+
+def allocate_names(items, output_dir):
+    # the name allocation of the tools: <prefix>_[<n>_]<timestamp><ext>
+    allocator = NameAllocator()
+    names = []
+    for fn, datetime_object in items:
+        datetime_str = datetime_object.strftime('%Y%m%d_%H%M%S')
+        file_ext = os.path.splitext(fn)[1]
+        names.append((fn, allocator.allocate(output_dir, lambda number: make_name(datetime_str, file_ext, number))))
+    return names
+
+
+def run_stages(tool, corpus_dir, ext, work_dir):
+    # times the stages of a tool in-process; returns {stage: result}
+    results = {}
+    output_dir = tempfile.mkdtemp(dir=work_dir)
+    try:
+        reset = reset_peak_rss()
+        t_start = time.perf_counter()
+        entries = list(scan_files(corpus_dir, parse_extensions(ext)))
+        num_bytes = sum(e.stat().st_size for e in entries)
+        results['discovery'] = make_result(time.perf_counter() - t_start, len(entries), num_bytes,
+                                           get_stage_peak_rss_kb(reset))
+
+        get_datetime = get_datatime_and_source_from_image if tool == 'rename_img' else get_mtime_datetime
+        reset = reset_peak_rss()
+        t_start = time.perf_counter()
+        items = [(e.path, get_datetime(e.path)[0]) for e in entries]
+        results['metadata'] = make_result(time.perf_counter() - t_start, len(items), num_bytes,
+                                          get_stage_peak_rss_kb(reset))
+
+        reset = reset_peak_rss()
+        t_start = time.perf_counter()
+        names = allocate_names(items, output_dir)
+        results['naming'] = make_result(time.perf_counter() - t_start, len(names), 0, get_stage_peak_rss_kb(reset))
+
+        converter = get_converter() if tool == 'convert' else None
+        if tool == 'convert' and converter is None:
+            results['transfer'] = {'skipped': 'no HEIC converter available'}
+        else:
+            reset = reset_peak_rss()
+            t_start = time.perf_counter()
+            for fn, file_new in names:
+                if converter is not None:
+                    convert_file(converter, fn, os.path.splitext(file_new)[0] + '.jpg', 95)
+                else:
+                    transfer_file(fn, file_new, 'copy')
+            results['transfer'] = make_result(time.perf_counter() - t_start, len(names), num_bytes,
+                                              get_stage_peak_rss_kb(reset))
+    finally:
+        shutil.rmtree(output_dir)
+    return results
+
+
+def run_end_to_end(tool, variant, extra_args, corpus_dir, ext, work_dir):
+    # runs a tool as subprocess; peak_rss_kb is the one of the tool process, workers_peak_rss_kb the largest one of
+    # its worker processes (0 without workers)
+    script = TOOLS[tool][0]
+    output_dir = tempfile.mkdtemp(dir=work_dir)
+    num_files, num_bytes = 0, 0
+    for e in scan_files(corpus_dir, parse_extensions(ext)):
+        num_files += 1
+        num_bytes += e.stat().st_size
+    try:
+        cmd = [sys.executable, '-c', LAUNCHER, os.path.dirname(script), script,
+               '--input_dir', corpus_dir, '--output_dir', output_dir, '--ext', ext]
+        t_start = time.perf_counter()
+        p = subprocess.Popen(cmd + extra_args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        _, err = p.communicate()
+        duration = time.perf_counter() - t_start
+    finally:
+        shutil.rmtree(output_dir)
+
+    peak_rss_kb, workers_peak_rss_kb = None, None
+    for line in err.decode(errors='replace').splitlines():
+        if line.startswith('peak_rss_kb='):
+            peak_rss_kb = int(line.split('=')[1])
+        elif line.startswith('workers_peak_rss_kb='):
+            workers_peak_rss_kb = int(line.split('=')[1])
+    result = make_result(duration, num_files, num_bytes, peak_rss_kb)
+    result.update({'tool': tool, 'variant': variant, 'returncode': p.returncode,
+                   'workers_peak_rss_kb': workers_peak_rss_kb})
+    return result
+
+
+# --count 500 --duplicate_ratio 0.1 --output bench.json
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Benchmarks the tools on synthetic corpora and reports files/s, MB/s and peak RSS as JSON:\n usage: --count 500 --duplicate_ratio 0.1 --output bench.json')
+    parser.add_argument('--tools', help='comma separated tools (%s)' % ','.join(TOOLS), default=','.join(TOOLS))
+    parser.add_argument('--count', help='number of images per corpus', type=int, default=200)
+    parser.add_argument('--width', help='image width', type=int, default=1024)
+    parser.add_argument('--height', help='image height', type=int, default=768)
+    parser.add_argument('--exif_ratio', help='share of images with EXIF timestamps', type=float, default=1.0)
+    parser.add_argument('--duplicate_ratio', help='share of byte identical copies', type=float, default=0.0)
+    parser.add_argument('--burst_ratio', help='share of images with the timestamp of the previous one', type=float,
+                        default=0.0)
+    parser.add_argument('--jobs', help='number of jobs/io_depth of the parallel variant', type=int,
+                        default=os.cpu_count() or 1)
+    parser.add_argument('--work_dir', help='directory for the corpora and outputs (temporary)', default="")
+    parser.add_argument('--output', help='JSON result file (stdout)', default="")
+    parser.add_argument('--verbose', action='store_true', help='verbose', default=False)
+    args = parser.parse_args()
+
+    if args.width < 1 or args.height < 1:
+        print("invalid image size: %dx%d" % (args.width, args.height))
+        exit_failure()
+    tools = [t.strip() for t in args.tools.split(',') if t.strip()]
+    for tool in tools:
+        if tool not in TOOLS:
+            print("unknown tool: %s" % tool)
+            exit_failure()
+
+    work_dir = args.work_dir if args.work_dir != "" else tempfile.mkdtemp()
+    if not os.path.exists(work_dir):
+        os.makedirs(work_dir)
+
+    report = {'corpus': {'count': args.count, 'width': args.width, 'height': args.height,
+                         'exif_ratio': args.exif_ratio, 'duplicate_ratio': args.duplicate_ratio,
+                         'burst_ratio': args.burst_ratio},
+              'stages': {}, 'end_to_end': []}
+    corpora = {}
+    try:
+        for tool in tools:
+            fmt = TOOLS[tool][1]
+            if fmt not in corpora:
+                corpus_dir = os.path.join(work_dir, 'corpus_' + fmt)
+                try:
+                    generate_corpus(corpus_dir, args.count, fmt, args.width, args.height,
+                                    exif_ratio=args.exif_ratio, duplicate_ratio=args.duplicate_ratio,
+                                    burst_ratio=args.burst_ratio, verbose=args.verbose)
+                    corpora[fmt] = corpus_dir
+                except ImportError as e:
+                    corpora[fmt] = None
+                    print("cannot generate a %s corpus: %s" % (fmt, e))
+            corpus_dir = corpora[fmt]
+            if corpus_dir is None:
+                report['stages'][tool] = {'skipped': 'no %s corpus' % fmt}
+                continue
+
+            if args.verbose:
+                print("benchmarking %s" % tool)
+            report['stages'][tool] = run_stages(tool, corpus_dir, fmt, work_dir)
+            if tool == 'convert':
+                variants = [('sequential', ['--jobs', '1', '--io_depth', '1']),
+                            ('parallel', ['--jobs', str(args.jobs), '--io_depth', str(args.jobs)])]
+            else:
+                variants = [('sequential', ['--io_depth', '1']), ('parallel', ['--io_depth', str(args.jobs)])]
+            for variant, extra_args in variants:
+                report['end_to_end'].append(run_end_to_end(tool, variant, extra_args, corpus_dir, fmt, work_dir))
+    finally:
+        if args.work_dir == "":
+            shutil.rmtree(work_dir)
+
+    if args.output != "":
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    exit_success()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+# Software License Agreement (GNU GPLv3  License)
+#
+# Copyright (c) 2022, Roland Jung (rolandjung0@gmail.com)
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# export-exif subcommand: extracts the timestamp, camera, GPS position, dimensions and orientation of all images of a
+# tree into one columnar catalog file, so that other tools can query them without opening the images again. Only the
+# EXIF headers are read (in the I/O threads), other formats fall back to Pillow. The catalog is written batch by batch
+# as Parquet or Arrow file (needs pyarrow) or as CSV.
+
+import os
+from datetime import datetime
+
+from py_image_modifier.common import exit_success, exit_failure, IO_DEPTH, BATCH_SIZE
+from py_image_modifier.exif import read_exif_tags, get_tags_from_tiff, EXIF_HEADER
+
+HELP = 'exports the EXIF data of all images into a catalog (Parquet, Arrow or CSV)'
+DESCRIPTION = 'Exporting timestamp, camera, GPS position, dimensions and orientation of all images from the input_dir into a catalog file:\n usage: --input_dir ../test/rename_in --catalog photos.parquet --ext jpg,heic'
+
+CATALOG_FIELDS = ['path', 'size', 'mtime', 'datetime', 'make', 'model', 'serial', 'width', 'height', 'orientation',
+                  'latitude', 'longitude', 'altitude']
+ARROW_EXTENSIONS = ['.parquet', '.arrow', '.feather']
+
+
+def get_tags_with_pillow(fn):
+    # returns (tags, (width, height)) of an image that the header-only reader cannot handle; raises OSError
+    from PIL import Image
+    try:
+        import pillow_heif
+        pillow_heif.register_heif_opener()
+    except ImportError:
+        pass
+
+    with Image.open(fn) as img:  # only the header is read
+        return get_tags_from_tiff(img.getexif().tobytes()[len(EXIF_HEADER):]), img.size
+
+
+def read_image_info(dir_entry):
+    # runs in the I/O threads: returns the catalog row of an image, or None if it cannot be read
+    fn = dir_entry.path
+    try:
+        st = dir_entry.stat()
+        tags, parsed = read_exif_tags(fn)
+        size = None
+        if not parsed:
+            tags, size = get_tags_with_pillow(fn)
+        elif tags is None or tags['width'] is None:
+            size = get_tags_with_pillow(fn)[1]
+    except (OSError, ValueError, SyntaxError):
+        return None
+
+    row = tags or dict((name, None) for name in CATALOG_FIELDS)
+    row['path'] = os.path.abspath(fn)
+    row['size'] = st.st_size
+    row['mtime'] = datetime.fromtimestamp(st.st_mtime)
+    if size is not None:
+        row['width'], row['height'] = size
+    if row['datetime'] is not None:
+        try:
+            row['datetime'] = datetime.strptime(row['datetime'], '%Y:%m:%d %H:%M:%S')
+        except ValueError:
+            row['datetime'] = None
+    return row
+
+
+class CatalogWriter(object):
+    """
+    Writes the catalog batch by batch: a row group (Parquet) or record batch (Arrow) per batch, or CSV lines.
+    The file is written under a temporary name and renamed when complete.
+    """
+    def __init__(self, fn):
+        from py_image_modifier.journal import get_temp_filename
+
+        self.fn = fn
+        self.tmp_file = get_temp_filename(fn)
+        self.num_rows = 0
+        ext = os.path.splitext(fn)[1].lower()
+        if ext in ARROW_EXTENSIONS:
+            import pyarrow
+            self.schema = pyarrow.schema([
+                ('path', pyarrow.string()), ('size', pyarrow.int64()), ('mtime', pyarrow.timestamp('us')),
+                ('datetime', pyarrow.timestamp('s')), ('make', pyarrow.string()), ('model', pyarrow.string()),
+                ('serial', pyarrow.string()), ('width', pyarrow.int32()), ('height', pyarrow.int32()),
+                ('orientation', pyarrow.int16()), ('latitude', pyarrow.float64()), ('longitude', pyarrow.float64()),
+                ('altitude', pyarrow.float64())])
+            if ext == '.parquet':
+                import pyarrow.parquet
+                self.writer = pyarrow.parquet.ParquetWriter(self.tmp_file, self.schema)
+            else:
+                import pyarrow.ipc
+                self.writer = pyarrow.ipc.new_file(self.tmp_file, self.schema)
+            self.file = None
+        else:
+            import csv
+            self.schema = None
+            self.file = open(self.tmp_file, 'w', newline='')
+            self.writer = csv.DictWriter(self.file, fieldnames=CATALOG_FIELDS)
+            self.writer.writeheader()
+
+    def write(self, rows):
+        if not rows:
+            return
+        if self.schema is not None:
+            import pyarrow
+            columns = dict((name, [row[name] for row in rows]) for name in CATALOG_FIELDS)
+            self.writer.write_table(pyarrow.Table.from_pydict(columns, schema=self.schema))
+        else:
+            self.writer.writerows(rows)
+        self.num_rows += len(rows)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+        else:
+            self.writer.close()
+        os.replace(self.tmp_file, self.fn)
+
+
+def add_arguments(parser):
+    parser.add_argument('--input_dir', help='directory with images', default="")
+    parser.add_argument('--catalog', help='catalog file: .parquet, .arrow/.feather (needs pyarrow) or .csv',
+                        default="")
+    parser.add_argument('--ext', help='file extension(s), case-insensitive, e.g. jpg,heic', default='jpg,jpeg,heic')
+    parser.add_argument('--verbose', action='store_true', help='verbose', default=False)
+    parser.add_argument('--no_recursive', action='store_true', help='no recursive file search', default=False)
+    parser.add_argument('--io_depth', help='number of file operations in flight (%d)' % IO_DEPTH, type=int,
+                        default=IO_DEPTH)
+    parser.add_argument('--batch_size', help='rows per row group/batch (%d)' % BATCH_SIZE, type=int,
+                        default=BATCH_SIZE)
+
+
+def run(args):
+    from tqdm import tqdm
+    from py_image_modifier.discovery import parse_extensions, scan_files, prefetch
+    from py_image_modifier.io_engine import IoEngine
+
+    if args.input_dir == "":
+        print('no input_dir specified!')
+        exit_failure()
+    path = os.path.abspath(args.input_dir)
+    if not os.path.isdir(path):
+        print("is not a directory %s" % path)
+        exit_failure()
+    if args.catalog == "":
+        print('no catalog specified!')
+        exit_failure()
+    try:
+        writer = CatalogWriter(args.catalog)
+    except ImportError:
+        print("pyarrow is needed for %s, use a .csv catalog or: pip install pyarrow" % args.catalog)
+        exit_failure()
+
+    total_error = 0
+    files = prefetch(scan_files(path, parse_extensions(args.ext), not (args.no_recursive), args.verbose))
+    rows = []
+    with IoEngine(args.io_depth) as engine, tqdm(unit='imgs') as pbar:
+        for dir_entry, row in engine.map_ordered(read_image_info, files):
+            if row is None:
+                print("failure at: %s" % dir_entry.path)
+                total_error += 1
+            else:
+                rows.append(row)
+            if len(rows) >= max(args.batch_size, 1):
+                writer.write(rows)
+                rows = []
+            pbar.update(1)
+        writer.write(rows)
+    writer.close()
+
+    print("catalog written: %s" % args.catalog)
+    print("total exported images: %s" % writer.num_rows)
+    print("total error files: %s" % total_error)
+    exit_success()
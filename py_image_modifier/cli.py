@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# Software License Agreement (GNU GPLv3  License)
+#
+# Copyright (c) 2022, Roland Jung (rolandjung0@gmail.com)
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Single entry point of all tools: py_image_modifier <convert|rename-img|rename-file|export-exif|merge> [options]
+# Only argparse and the command modules are loaded here; Pillow, tqdm, sqlite3 and the thread pools are imported when
+# a command runs, so that --help and hooks (cron, udev) start fast.
+
+import sys
+import argparse
+
+from py_image_modifier import convert, rename_img, rename_file, catalog, merge
+
+COMMANDS = [('convert', convert), ('rename-img', rename_img), ('rename-file', rename_file), ('export-exif', catalog),
+            ('merge', merge)]
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(prog='py_image_modifier', description='Some tools to modify/convert images.')
+    subparsers = parser.add_subparsers(dest='command', metavar='command')
+    for name, module in COMMANDS:
+        subparser = subparsers.add_parser(name, help=module.HELP, description=module.DESCRIPTION)
+        module.add_arguments(subparser)
+        subparser.set_defaults(run=module.run)
+    return parser
+
+
+def main(argv=None):
+    parser = make_parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        sys.exit(1)
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
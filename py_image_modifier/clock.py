@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+# Software License Agreement (GNU GPLv3  License)
+#
+# Copyright (c) 2022, Roland Jung (rolandjung0@gmail.com)
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Clock corrections per camera: a table of offsets keyed by the EXIF Make/Model/serial number of the camera and a time
+# range of its clock, e.g.
+#   make,model,serial,start,end,offset
+#   Canon,Canon EOS 80D,,2023-07-01 00:00:00,2023-07-15 23:59:59,-3600
+#   Apple,iPhone 12,,,,0:02:30
+# Empty fields match every camera or time; the first matching row is applied to the uncorrected timestamp. The offsets
+# can be estimated from the shots of several cameras that overlap in time: the shot times of every camera are aligned
+# to the cameras aligned before it, by a histogram cross-correlation (with NumPy if it is installed) followed by the
+# median distance to the nearest shot.
+
+import bisect
+from datetime import datetime, timedelta
+
+OFFSET_FIELDS = ['make', 'model', 'serial', 'start', 'end', 'offset', 'shots', 'matches']
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+EPOCH = datetime(1970, 1, 1)
+MAX_SKEW = 14 * 3600  # seconds, the largest time zone difference
+MATCH_WINDOW = 60  # seconds between shots of two cameras that count as overlapping
+MIN_MATCHES = 5
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def parse_offset(value):
+    # returns the seconds of an offset given as seconds or as [-]H:MM[:SS]
+    value = value.strip()
+    if ':' not in value:
+        return float(value)
+    sign = -1 if value.startswith('-') else 1
+    hours, minutes, seconds = ([float(part) for part in value.lstrip('+-').split(':')] + [0, 0])[:3]
+    return sign * (hours * 3600 + minutes * 60 + seconds)
+
+
+def parse_time(value):
+    value = value.strip()
+    return datetime.strptime(value, TIME_FORMAT) if value else None
+
+
+def to_seconds(datetime_object):
+    return (datetime_object - EPOCH).total_seconds()
+
+
+def format_device(device):
+    return ' '.join(part for part in device if part) or '<unknown>'
+
+
+class OffsetRow(object):
+    __slots__ = ['make', 'model', 'serial', 'start', 'end', 'offset']
+
+    def __init__(self, make='', model='', serial='', start=None, end=None, offset=0):
+        self.make = make
+        self.model = model
+        self.serial = serial
+        self.start = start
+        self.end = end
+        self.offset = offset  # seconds
+
+    def matches(self, device, datetime_object):
+        make, model, serial = device or ('', '', '')
+        for key, value in [(self.make, make), (self.model, model), (self.serial, serial)]:
+            if key and key.lower() != value.lower():
+                return False
+        if self.start is not None and datetime_object < self.start:
+            return False
+        if self.end is not None and datetime_object > self.end:
+            return False
+        return True
+
+
+class OffsetTable(object):
+    def __init__(self, rows=None):
+        self.rows = rows or []
+
+    @staticmethod
+    def load(fn):
+        # reads a CSV table, raises ValueError on invalid rows
+        import csv
+        rows = []
+        with open(fn, newline='') as f:
+            for line, row in enumerate(csv.DictReader(f), 2):
+                try:
+                    rows.append(OffsetRow((row.get('make') or '').strip(), (row.get('model') or '').strip(),
+                                          (row.get('serial') or '').strip(), parse_time(row.get('start') or ''),
+                                          parse_time(row.get('end') or ''), parse_offset(row.get('offset') or '0')))
+                except ValueError as e:
+                    raise ValueError("line %d: %s" % (line, e))
+        return OffsetTable(rows)
+
+    def get_offset(self, device, datetime_object):
+        # returns the correction of a timestamp of device, the first matching row wins
+        for row in self.rows:
+            if row.matches(device, datetime_object):
+                return timedelta(seconds=row.offset)
+        return timedelta(0)
+
+
+def get_coarse_shift(pool_bins, bins, max_shift):
+    # returns the shift in [-max_shift, max_shift] that moves most of bins onto pool_bins, the smallest one on ties
+    if numpy is not None:
+        low, high = min(bins) - max_shift, max(bins) + max_shift
+        size = high - low + 1
+        pool_bins = numpy.asarray(pool_bins)
+        pool = numpy.zeros(size)
+        pool[pool_bins[(pool_bins >= low) & (pool_bins <= high)] - low] = 1
+        counts = numpy.bincount(numpy.asarray(bins) - low, minlength=size).astype(float)
+        n = 1 << int(2 * size - 1).bit_length()
+        # cross-correlation by FFT: scores[k] = sum_i counts[i] * pool[i + k]
+        scores = numpy.fft.irfft(numpy.fft.rfft(pool, n) * numpy.conj(numpy.fft.rfft(counts, n)), n)
+        scores = numpy.rint(numpy.concatenate([scores[n - max_shift:], scores[:max_shift + 1]]))
+        shifts = numpy.arange(-max_shift, max_shift + 1)
+        best = shifts[scores == scores.max()]
+        return int(best[numpy.argmin(numpy.abs(best))])
+
+    pool = set(pool_bins)
+    counts = {}
+    for b in bins:
+        counts[b] = counts.get(b, 0) + 1
+    best, best_score = 0, -1
+    for shift in sorted(range(-max_shift, max_shift + 1), key=abs):
+        score = sum(count for b, count in counts.items() if b + shift in pool)
+        if score > best_score:
+            best, best_score = shift, score
+    return best
+
+
+def align(pool, times, max_skew=MAX_SKEW, window=MATCH_WINDOW):
+    # returns (offset, number of matched shots) that aligns the shot times (seconds) to the sorted pool times
+    pool_bins = set()
+    for t in pool:  # widened by a bin, shots close to a bin border must still meet
+        b = int(t // window)
+        pool_bins.update((b - 1, b, b + 1))
+    coarse = window * get_coarse_shift(sorted(pool_bins), [int(t // window) for t in times], int(max_skew // window))
+
+    # the median distance to the nearest shot of the pool:
+    if numpy is not None:
+        pool_array = numpy.asarray(pool)
+        shifted = numpy.asarray(times) + coarse
+        i = numpy.searchsorted(pool_array, shifted)
+        after = pool_array[numpy.minimum(i, len(pool) - 1)] - shifted
+        before = pool_array[numpy.maximum(i - 1, 0)] - shifted
+        nearest = numpy.where(numpy.abs(before) <= numpy.abs(after), before, after)
+        diffs = numpy.sort(nearest[numpy.abs(nearest) <= window]).tolist()
+    else:
+        diffs = []
+        for t in times:
+            t += coarse
+            i = bisect.bisect_left(pool, t)
+            nearest = min([pool[j] - t for j in (i - 1, i) if 0 <= j < len(pool)], key=abs)
+            if abs(nearest) <= window:
+                diffs.append(nearest)
+        diffs.sort()
+    if not diffs:
+        return coarse, 0
+    return coarse + diffs[(len(diffs) - 1) // 2], len(diffs)
+
+
+def estimate_offsets(shots, reference=None, max_skew=MAX_SKEW, window=MATCH_WINDOW, min_matches=MIN_MATCHES):
+    """
+    Estimates the clock offsets of several cameras from their shots: shots is {device: [datetime_object]}. The reference
+    is the first camera whose name contains reference, or the camera with the most shots; the others are aligned one
+    after another, the best overlapping first, to all cameras aligned before.
+    Returns [(device, offset in seconds or None, number of shots, number of matched shots)].
+    """
+    devices = sorted(shots, key=lambda device: len(shots[device]), reverse=True)
+    if not devices:
+        return []
+    if reference:
+        devices.sort(key=lambda device: reference.lower() not in format_device(device).lower())
+    times = dict((device, sorted(to_seconds(t) for t in shots[device])) for device in devices)
+    reference = devices[0]
+    pool = list(times[reference])
+    result = [(reference, 0, len(pool), len(pool))]
+    pending = devices[1:]
+    while pending:
+        matches = [(align(pool, times[device], max_skew, window), device) for device in pending]
+        (offset, num_matched), device = max(matches, key=lambda match: match[0][1])
+        if num_matched < min_matches:
+            result += [(device, None, len(times[device]), 0) for device in pending]
+            break
+        result.append((device, int(round(offset)), len(times[device]), num_matched))
+        pool = sorted(pool + [t + offset for t in times[device]])
+        pending.remove(device)
+    return result
+
+
+def make_table(shots, estimates):
+    # returns the OffsetTable of the estimated offsets, keyed by the camera and the time range of its shots
+    return OffsetTable([OffsetRow(device[0], device[1], device[2], min(shots[device]),
+                                  max(shots[device]), offset)
+                        for device, offset, num_shots, num_matched in estimates if offset is not None])
+
+
+def write_estimates(fn, shots, estimates):
+    # writes the estimated offsets as CSV table; cameras without overlapping shots get the offset 0 and no matches
+    import csv
+    with open(fn, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=OFFSET_FIELDS)
+        writer.writeheader()
+        for device, offset, num_shots, num_matched in estimates:
+            writer.writerow({'make': device[0], 'model': device[1], 'serial': device[2],
+                             'start': min(shots[device]).strftime(TIME_FORMAT),
+                             'end': max(shots[device]).strftime(TIME_FORMAT), 'offset': offset or 0,
+                             'shots': num_shots, 'matches': num_matched})
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# Software License Agreement (GNU GPLv3  License)
+#
+# Copyright (c) 2022, Roland Jung (rolandjung0@gmail.com)
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Helpers shared by the command line tools. This module is imported for --help as well, keep its imports light.
+
+import sys
+from datetime import datetime
+
+IO_DEPTH = 8
+BATCH_SIZE = 10000
+THUMBNAIL_SIZE = 256
+CACHE_SIZE_MB = 1024
+SETTLE_TIME = 2.0  # seconds
+POLL_INTERVAL = 5.0  # seconds
+HASH_DISTANCE = 6  # max. number of differing bits (of 64) of near-duplicate images
+MODES = ['copy', 'move', 'hardlink', 'reflink', 'symlink']
+EXIF_MODES = ['copy', 'move', 'reflink']  # modes that create a file of its own, see --write_exif
+
+
+def exit_success():
+    print("#########################   SUCCESS   #######################")
+    sys.exit(0)
+
+
+def exit_failure():
+    print("#########################   FAILURE   #######################")
+    sys.exit(1)
+
+
+def add_common_arguments(parser, verb):
+    # arguments of all tools; verb is 'copied' or 'converted'
+    parser.add_argument('--input_dir', help='directory with images', default="")
+    parser.add_argument('--output_dir', help='directory for %s images' % verb, default="")
+    parser.add_argument('--verbose', action='store_true', help='verbose', default=False)
+    parser.add_argument('--create_tree', action='store_true', help='create date folder tree', default=False)
+    parser.add_argument('--no_recursive', action='store_true', help='no recursive file search', default=False)
+    parser.add_argument('--index', action='store_true',
+                        help='keep a metadata index in the output_dir and skip files %s by previous runs' % verb,
+                        default=False)
+    parser.add_argument('--io_depth', help='number of file operations in flight (%d)' % IO_DEPTH, type=int,
+                        default=IO_DEPTH)
+    parser.add_argument('--resume', action='store_true',
+                        help='skip files that were %s by a previous (interrupted) run' % verb, default=False)
+    parser.add_argument('--batch_size',
+                        help='plan and process at most N files at a time, bounds the memory (%d, 0: all at once)'
+                             % BATCH_SIZE, type=int, default=BATCH_SIZE)
+    parser.add_argument('--shard', help='process only the files of shard i of N (i/N, e.g. 2/4), several hosts or '
+                                        'processes share one tree this way; see the merge command', default=None)
+    parser.add_argument('--dry_run', action='store_true',
+                        help='only plan the run: print (or save with --plan) the destination of every file', default=False)
+    parser.add_argument('--plan', help='save the plan of the run as .json or .csv file', default=None)
+    parser.add_argument('--skip_similar', action='store_true',
+                        help='skip near-duplicates (burst shots, re-encoded copies) of images %s before' % verb,
+                        default=False)
+    parser.add_argument('--similar_report', help='write the groups of near-duplicates to a .json or .csv file',
+                        default=None)
+    parser.add_argument('--similar_hash', help='perceptual hash of --skip_similar/--similar_report (dhash)',
+                        choices=['dhash', 'phash'], default='dhash')
+    parser.add_argument('--similar_distance',
+                        help='max. number of differing bits (of 64) of near-duplicates (%d)' % HASH_DISTANCE,
+                        type=int, default=HASH_DISTANCE)
+    parser.add_argument('--thumbnails', action='store_true',
+                        help='add a thumbnail of every new file to the thumbnail cache', default=False)
+    parser.add_argument('--thumbnail_dir', help='thumbnail cache (<output_dir>/.thumbnails)', default=None)
+    parser.add_argument('--thumbnail_size', help='maximal width/height of the thumbnails (%d)' % THUMBNAIL_SIZE,
+                        type=int, default=THUMBNAIL_SIZE)
+    parser.add_argument('--thumbnail_cache_mb', help='size cap of the thumbnail cache in MB (%d)' % CACHE_SIZE_MB,
+                        type=int, default=CACHE_SIZE_MB)
+    parser.add_argument('--profile', action='store_true',
+                        help='print the latencies (p50/p95/max), counts and bytes of every stage', default=False)
+    parser.add_argument('--metrics', help='write the stage metrics to a .json or Prometheus textfile (.prom)',
+                        default=None)
+    parser.add_argument('--cprofile', help='profile the main loop with cProfile and save the stats to a file',
+                        default=None)
+    parser.add_argument('--watch', action='store_true',
+                        help='keep running and process new files of the input_dir as they appear', default=False)
+    parser.add_argument('--settle', help='--watch: seconds a new file must stay unchanged (%.1f)' % SETTLE_TIME,
+                        type=float, default=SETTLE_TIME)
+    parser.add_argument('--poll_interval',
+                        help='--watch: seconds between scans if inotify is not available (%.1f)' % POLL_INTERVAL,
+                        type=float, default=POLL_INTERVAL)
+
+
+def get_datetime_and_source_from_entry(dir_entry):
+    # the modification timestamp from the cached stat of an os.DirEntry; (None, None) on failure
+    try:
+        return datetime.fromtimestamp(dir_entry.stat().st_mtime), 'mtime'
+    except OSError:
+        return None, None
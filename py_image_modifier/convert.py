@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# Software License Agreement (GNU GPLv3  License)
+#
+# Copyright (c) 2022, Roland Jung (rolandjung0@gmail.com)
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# convert subcommand: converts HEIC images to JPEG (or other formats and sizes) named by their timestamp.
+
+import os
+
+from py_image_modifier.common import add_common_arguments, exit_success, exit_failure
+from py_image_modifier.pipeline import Pipeline
+
+HELP = 'converts HEIC images to JPEG named by their timestamp'
+DESCRIPTION = 'Converting all HEIC files from the input_dir and stores it in output_dir using pillow-heif or heif-convert (sudo apt install libheif-examples):\n usage: --input_dir ../test/rename_in --output_dir ../test/rename_out --ext heic --prefix bla --verbose'
+
+
+def make_name(prefix, datetime_str, number, suffix=".jpg"):
+    # <prefix>_<timestamp>.jpg or <prefix>_<n>_<timestamp>.jpg
+    if number == 0:
+        return prefix + "_" + datetime_str + suffix
+    return prefix + "_" + str(number) + "_" + datetime_str + suffix
+
+
+class ConvertPipeline(Pipeline):
+    tool = 'convert'
+
+    def __init__(self, args, converter, renditions):
+        Pipeline.__init__(self, args)
+        self.converter = converter
+        self.renditions = renditions
+        self.executor = None
+
+    def make_name(self, file_orig, datetime_str, number):
+        # Add a prefix or take original basename:
+        if self.args.prefix != '':
+            prefix = self.args.prefix
+        else:
+            basename = os.path.basename(file_orig)  # os independent
+            prefix = os.path.splitext(basename)[0]
+        return make_name(prefix, datetime_str, number, self.renditions[0].get_suffix())
+
+    def get_siblings(self, name):
+        from py_image_modifier.converter import get_rendition_files
+        return get_rendition_files(name, self.renditions)[1:]
+
+    def get_action(self):
+        return 'convert'
+
+    def start(self):
+        from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+        # in-process decoders hold the GIL, external ones only need a thread waiting for them:
+        pool_type = ProcessPoolExecutor if self.converter.in_process else ThreadPoolExecutor
+        self.executor = pool_type(max_workers=self.args.jobs)
+
+    def submit(self, item):
+        from py_image_modifier.converter import convert_file
+        from py_image_modifier.profiling import timed_call
+        return self.executor.submit(timed_call, convert_file, self.converter, item.source, item.destination,
+                                    self.args.quality, self.renditions)
+
+    def max_in_flight(self):
+        return 2 * self.args.jobs
+
+    def stop(self):
+        self.executor.shutdown(wait=True)
+
+
+def add_arguments(parser):
+    add_common_arguments(parser, 'converted')
+    parser.add_argument('--quality', required=False, type=int, choices=range(0, 101), metavar='[0-100]', help='JPEG/WebP/AVIF quality 0-100 (95)', default=95)
+    parser.add_argument('--prefix', help='prefix to the final image name: <prefix><data>.<ext>', default='')
+    parser.add_argument('--ext', help='file extension(s), case-insensitive, e.g. jpg,jpeg', default='HEIC')
+    parser.add_argument('--skip_duplicates', action='store_true',
+                        help='skip files with identical content (in the input_dir)', default=False)
+    parser.add_argument('--jobs', help='number of concurrent conversions (number of cores)', type=int,
+                        default=os.cpu_count() or 1)
+    parser.add_argument('--converter', help='HEIC decoder: pillow (pillow-heif), heif-convert or auto', default='auto',
+                        choices=['auto', 'pillow', 'heif-convert'])
+    parser.add_argument('--renditions',
+                        help='output files per image, comma separated <format>[:<max width/height>] with format jpg, '
+                             'webp, avif or png, e.g. jpg,webp:2048,webp:512 (jpg)', default='jpg')
+
+
+def run(args):
+    from py_image_modifier.converter import get_converter, parse_renditions
+
+    if args.jobs < 1:
+        print("--jobs must be at least 1")
+        exit_failure()
+    try:
+        renditions = parse_renditions(args.renditions)
+    except ValueError as e:
+        print("invalid --renditions: %s" % e)
+        exit_failure()
+
+    converter = get_converter(args.converter)
+    if converter is None:
+        print("no HEIC converter available: %s" % args.converter)
+        exit_failure()
+    if not converter.can_transcode(renditions):
+        print("converter %s cannot write the renditions: %s" % (converter.name, args.renditions))
+        exit_failure()
+    if args.verbose:
+        print("using converter: %s" % converter.name)
+
+    ConvertPipeline(args, converter, renditions).run()
+    exit_success()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+# Software License Agreement (GNU GPLv3  License)
+#
+# Copyright (c) 2022, Roland Jung (rolandjung0@gmail.com)
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Requirements:
+# sudo apt install libheif-examples  (heif-convert backend)
+# sudo pip install Pillow pillow-heif  (pillow backend)
+
+import os
+import shutil
+import subprocess
+
+from py_image_modifier.journal import get_temp_filename
+
+# format -> (Pillow format, extension)
+FORMATS = {'jpg': ('JPEG', '.jpg'), 'webp': ('WEBP', '.webp'), 'avif': ('AVIF', '.avif'), 'png': ('PNG', '.png')}
+
+
+class Rendition(object):
+    """
+    One output file of a conversion: format and maximal width/height in pixels (0: original size).
+    """
+    __slots__ = ('format', 'max_size')
+
+    def __init__(self, format='jpg', max_size=0):
+        self.format = format
+        self.max_size = max_size
+
+    def __eq__(self, other):
+        return (self.format, self.max_size) == (other.format, other.max_size)
+
+    def get_suffix(self):
+        # <name>.jpg for the original size, <name>_<max_size>.jpg for smaller renditions
+        ext = FORMATS[self.format][1]
+        if self.max_size:
+            return "_%d%s" % (self.max_size, ext)
+        return ext
+
+
+DEFAULT_RENDITIONS = [Rendition()]
+
+
+def parse_renditions(spec):
+    # 'jpg,webp:2048' -> [Rendition('jpg', 0), Rendition('webp', 2048)]; raises ValueError
+    renditions = []
+    for item in spec.split(','):
+        format, _, max_size = item.strip().lower().partition(':')
+        if format == 'jpeg':
+            format = 'jpg'
+        if format not in FORMATS:
+            raise ValueError("unknown format: %s" % format)
+        rendition = Rendition(format, int(max_size) if max_size else 0)
+        if rendition.max_size < 0:
+            raise ValueError("negative size: %s" % item)
+        if rendition.get_suffix() in [r.get_suffix() for r in renditions]:
+            raise ValueError("rendition listed twice: %s" % item)
+        renditions.append(rendition)
+    if not renditions:
+        raise ValueError("no rendition")
+    return renditions
+
+
+def get_rendition_files(file_new, renditions):
+    # file_new is the file of the first rendition, the others are named after it
+    base = file_new[:len(file_new) - len(renditions[0].get_suffix())]
+    return [base + rendition.get_suffix() for rendition in renditions]
+
+
+def get_target_size(size, max_size):
+    width, height = size
+    if not max_size or max(width, height) <= max_size:
+        return size
+    scale = max_size / float(max(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def get_png_xmp(xmp):
+    # PNG keeps XMP in an iTXt chunk, which Pillow does not write from the xmp parameter
+    if not xmp:
+        return None
+    from PIL.PngImagePlugin import PngInfo
+    info = PngInfo()
+    info.add_itxt('XML:com.adobe.xmp', xmp.decode('utf-8', errors='replace') if isinstance(xmp, bytes) else xmp)
+    return info
+
+
+class Converter(object):
+    """
+    Converts a single HEIC file into a JPEG file (or several renditions). Converters are stateless and picklable,
+    so that they can be handed to a process pool.
+    """
+    name = None
+    # True if the conversion runs inside the python process (use processes instead of threads for parallelism)
+    in_process = False
+
+    @staticmethod
+    def is_available():
+        return False
+
+    def convert(self, file_orig, file_new, quality):
+        # returns (output, success)
+        raise NotImplementedError
+
+    def can_transcode(self, renditions):
+        return renditions == DEFAULT_RENDITIONS
+
+    def transcode(self, file_orig, outputs, quality):
+        # outputs: [(file, Rendition)]; returns (output, success)
+        (file_new, rendition), = outputs
+        return self.convert(file_orig, file_new, quality)
+
+
+class HeifConvertConverter(Converter):
+    name = 'heif-convert'
+    in_process = False
+
+    @staticmethod
+    def is_available():
+        return shutil.which('heif-convert') is not None
+
+    def convert(self, file_orig, file_new, quality):
+        # run the bash command:  sudo apt install libheif-examples
+        args = ['heif-convert', '-q ' + str(quality), file_orig, file_new]
+        try:
+            p1 = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            output, _ = p1.communicate()
+        except OSError as e:
+            return str(e), False
+
+        return output.decode(errors='replace'), p1.returncode == 0
+
+
+class PillowHeifConverter(Converter):
+    name = 'pillow'
+    in_process = True
+
+    @staticmethod
+    def is_available():
+        try:
+            import pillow_heif
+        except ImportError:
+            return False
+        return True
+
+    def convert(self, file_orig, file_new, quality):
+        return self.transcode(file_orig, [(file_new, Rendition())], quality)
+
+    def can_transcode(self, renditions):
+        from PIL import Image
+        Image.init()
+        return all(FORMATS[rendition.format][0] in Image.SAVE for rendition in renditions)
+
+    def transcode(self, file_orig, outputs, quality):
+        # all renditions are made from a single decode, from the largest to the smallest
+        from PIL import Image
+        import pillow_heif
+        pillow_heif.register_heif_opener()
+
+        outputs = sorted(outputs, key=lambda output: output[1].max_size or float('inf'), reverse=True)
+        try:
+            with Image.open(file_orig) as img:
+                # keep the metadata: EXIF, color profile and XMP
+                params = {}
+                for key in ['exif', 'icc_profile', 'xmp']:
+                    if img.info.get(key):
+                        params[key] = img.info[key]
+
+                largest = outputs[0][1].max_size
+                if largest and img.format == 'JPEG':
+                    # DCT scaling: decode at 1/2, 1/4 or 1/8 of the size, but not below the largest rendition
+                    img.draft('RGB', get_target_size(img.size, largest))
+                image = img.convert('RGB') if img.mode not in ('RGB', 'L') else img.copy()
+
+            for file_new, rendition in outputs:
+                size = get_target_size(image.size, rendition.max_size)
+                if size != image.size:
+                    # reduce() by an integer factor first, then filter the remaining factor < 3
+                    image = image.resize(size, Image.LANCZOS, reducing_gap=3.0)
+                format = FORMATS[rendition.format][0]
+                if format == 'PNG':
+                    image.save(file_new, format, pnginfo=get_png_xmp(params.get('xmp')), **params)
+                else:
+                    image.save(file_new, format, quality=quality, **params)
+        except Exception as e:
+            return str(e), False
+
+        return "Written to " + ", ".join(file_new for file_new, rendition in outputs), True
+
+
+CONVERTERS = [PillowHeifConverter, HeifConvertConverter]
+
+
+def get_converter(name='auto'):
+    # 'auto' prefers the in-process decoder and falls back to heif-convert; returns None if nothing is available
+    for converter in CONVERTERS:
+        if name in ['auto', converter.name] and converter.is_available():
+            return converter()
+    return None
+
+
+def convert_file(converter, file_orig, file_new, quality, renditions=DEFAULT_RENDITIONS):
+    # the renditions are converted into temporary files, which are renamed once all of them are complete
+    files_new = get_rendition_files(file_new, renditions)
+    files_tmp = [get_temp_filename(fn) for fn in files_new]
+    try:
+        output, success = converter.transcode(file_orig, list(zip(files_tmp, renditions)), quality)
+
+        if success:
+            # change the modified timestamp of the new file based on the old files timestamp!
+            creation_time = os.path.getmtime(file_orig)
+            for file_tmp, fn in zip(files_tmp, files_new):
+                os.utime(file_tmp, (creation_time, creation_time))
+                os.replace(file_tmp, fn)
+                output = output.replace(file_tmp, fn)  # the converters report the temporary names
+    except OSError as e:
+        # e.g. a converter that exits with 0 without writing all files; the file counts as an error
+        output, success = str(e), False
+    finally:
+        for file_tmp in files_tmp:
+            try:
+                if os.path.exists(file_tmp):
+                    os.remove(file_tmp)
+            except OSError:
+                pass
+    return output, success
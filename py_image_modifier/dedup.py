@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# Software License Agreement (GNU GPLv3  License)
+#
+# Copyright (c) 2022, Roland Jung (rolandjung0@gmail.com)
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Content based duplicate detection: files are grouped by size and only files sharing their size with another file
+# are hashed, in the I/O threads as far as possible (see prepare()). Hashes are cached in the metadata index, so they
+# are computed once per file across runs.
+
+import os
+import hashlib
+
+from py_image_modifier.index import get_file_key
+from py_image_modifier.discovery import scan_files
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_hash(fn, chunk_size=CHUNK_SIZE):
+    h = hashlib.blake2b(digest_size=16)
+    with open(fn, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class DuplicateFinder(object):
+    def __init__(self, index=None):
+        self.index = index
+        self.paths = set()
+        self.sizes = {}  # size -> number of known files
+        self.unhashed = {}  # size -> [key] of files that were not hashed yet
+        self.hashed = {}  # (size, hash) -> path of the first file with that content
+        self.digests = {}  # path -> hash
+        self.first = {}  # size -> key of the first file seen with that size (None if hashed before), see prepare()
+        self.sources = {}  # path -> (key, destination) of the unhashed sources transferred by previous runs
+        if index is not None:
+            for path, size, mtime_ns, digest, destination in index.get_transferred_hashes():
+                if digest is None:
+                    self._register_transferred((path, size, mtime_ns), destination)
+                elif destination not in self.paths and os.path.exists(destination):
+                    self.paths.add(destination)
+                    self.sizes[size] = self.sizes.get(size, 0) + 1
+                    self.first.setdefault(size, None)
+                    self.hashed.setdefault((size, digest), destination)
+
+    def add_existing_dir(self, dir, exts):
+        # registers the files of an output tree; they are only hashed if an input file has the same size
+        for entry in scan_files(dir, exts):
+            try:
+                self._register(get_file_key(entry.path, entry))
+            except OSError:
+                pass
+
+    def prepare(self, key):
+        # runs in the I/O threads: hashes the file and the files of the same size seen before, so that find() mostly
+        # takes the cached digests; files with a size of their own are not hashed
+        source = self.sources.get(key[0])
+        if source is not None and source[0] == key:
+            return  # see find()
+        first = self.first.setdefault(key[1], key)
+        if first is not None and first[0] == key[0]:
+            return
+        for other_key in ([first] if first is not None else []) + list(self.unhashed.get(key[1], [])):
+            self._hash(other_key)
+        self._hash(key)
+
+    def find(self, fn, dir_entry=None):
+        # returns the path of an identical, already known file or None; fn is known afterwards
+        try:
+            key = get_file_key(fn, dir_entry)
+        except OSError:
+            return None
+        source = self.sources.get(key[0])
+        if source is not None and source[0] == key:
+            return source[1]
+        size = key[1]
+        self._register(key)
+        if self.sizes[size] < 2:
+            return None
+
+        for other_key in self.unhashed.pop(size, []):
+            digest = self._hash(other_key)
+            if digest is not None:
+                source = self.sources.get(other_key[0])
+                self.hashed.setdefault((size, digest), source[1] if source is not None else other_key[0])
+
+        other = self.hashed.get((size, self.digests.get(key[0])))
+        if other is None or other == key[0]:
+            return None
+        return other
+
+    def set_destination(self, key, destination):
+        # remembers the content of a transferred file for the next runs; key was taken before the transfer. Only a
+        # hash computed for a size collision is stored, the file is not read again
+        if self.index is not None:
+            self.index.set_hash_destination(key, self.digests.get(key[0]), destination)
+
+    def _register_transferred(self, key, destination):
+        # a file transferred without a file of the same size, hashed once one shows up: the unchanged source stands
+        # in for the result (a conversion, or a copy with rewritten EXIF dates that has the size but not the bytes of
+        # the source), else the result itself if it has the size of the source (a move of the rename tools)
+        try:
+            if get_file_key(key[0]) == key:
+                if os.path.exists(destination):
+                    self.sources[key[0]] = key, destination
+                    self.paths.add(destination)  # not registered again by add_existing_dir()
+                    self._register(key)
+                return
+        except OSError:
+            pass
+        try:
+            destination_key = get_file_key(destination)
+        except OSError:
+            return
+        if destination_key[1] == key[1]:
+            self._register(destination_key)
+
+    def _register(self, key):
+        if key[0] in self.paths:
+            return
+        self.paths.add(key[0])
+        self.sizes[key[1]] = self.sizes.get(key[1], 0) + 1
+        self.first.setdefault(key[1], key)
+        self.unhashed.setdefault(key[1], []).append(key)
+
+    def _hash(self, key):
+        digest = self.digests.get(key[0])
+        if digest is None and self.index is not None:
+            digest = self.index.get_hash(key)
+        if digest is None:
+            try:
+                digest = file_hash(key[0])
+            except OSError:
+                return None
+            if self.index is not None:
+                self.index.put_hash(key, digest)
+        self.digests[key[0]] = digest
+        return digest
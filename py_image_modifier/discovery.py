@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# Software License Agreement (GNU GPLv3  License)
+#
+# Copyright (c) 2022, Roland Jung (rolandjung0@gmail.com)
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Streaming file discovery: directories are scanned with os.scandir in a background thread and the found files are
+# handed over through a bounded queue, so processing starts while the scan of a slow (ifuse/NAS) tree continues.
+
+import os
+import queue
+import hashlib
+import threading
+
+from py_image_modifier.journal import TEMP_PREFIX
+from py_image_modifier.naming import CLAIM_PREFIX
+
+QUEUE_SIZE = 1024
+THUMBNAIL_DIR = '.thumbnails'  # default thumbnail cache in the output_dir (thumbnails.py), never scanned
+
+
+class FileEntry(object):
+    # os.DirEntry-like entry of a single path (e.g. reported by the watcher), the stat is cached as well
+    __slots__ = ('path', 'name', '_stat')
+
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.basename(path)
+        self._stat = None
+
+    def stat(self):
+        if self._stat is None:
+            self._stat = os.stat(self.path)
+        return self._stat
+
+
+def parse_extensions(ext):
+    # 'HEIC,heif' -> ('.heic', '.heif')
+    return tuple('.' + e.strip().lstrip('.').lower() for e in ext.split(',') if e.strip())
+
+
+def has_extension(name, exts):
+    return name.lower().endswith(exts)
+
+
+def scan_files(dir, exts, recursive=True, verbose=False):
+    # yields the os.DirEntry of every file with one of the extensions exts (case-insensitive)
+    try:
+        it = os.scandir(dir)
+    except OSError:
+        return
+    with it:
+        sub_dirs = []
+        for entry in it:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name != THUMBNAIL_DIR:
+                        sub_dirs.append(entry.path)
+                    continue
+                if not entry.is_file():
+                    continue
+            except OSError:
+                continue
+            if has_extension(entry.name, exts) and not entry.name.startswith((TEMP_PREFIX, CLAIM_PREFIX)):
+                if verbose:
+                    print("found file:%s" % entry.path)
+                yield entry
+
+    if recursive:
+        for sub_dir in sub_dirs:
+            yield from scan_files(sub_dir, exts, recursive, verbose)
+
+
+def parse_shard(shard):
+    # 'i/N' -> (i, N) with 1 <= i <= N; raises ValueError
+    i, n = [int(part) for part in shard.split('/')]
+    if not 1 <= i <= n:
+        raise ValueError("invalid shard %s" % shard)
+    return i, n
+
+
+def get_shard(path, root, num_shards):
+    # the shard (1..num_shards) of a file: a hash of its path relative to root, the same on every host
+    rel_path = os.path.relpath(path, root).replace(os.sep, '/')
+    digest = hashlib.blake2b(rel_path.encode('utf-8', errors='surrogateescape'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % num_shards + 1
+
+
+def select_shard(files, root, shard):
+    # yields the files of shard (i, N) of the tree root
+    i, n = shard
+    for entry in files:
+        if get_shard(entry.path, root, n) == i:
+            yield entry
+
+
+def prefetch(iterable, maxsize=QUEUE_SIZE):
+    # consumes iterable in a background thread, at most maxsize items are buffered
+    items = queue.Queue(maxsize=maxsize)
+    done = object()
+    error = []
+
+    def produce():
+        try:
+            for item in iterable:
+                items.put(item)
+        except BaseException as e:
+            error.append(e)
+        finally:
+            items.put(done)
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    while True:
+        item = items.get()
+        if item is done:
+            break
+        yield item
+    thread.join()
+    if error:
+        raise error[0]
+
+
+def get_files_with_ext(dir, ext, verbose, recursive):
+    return [entry.path for entry in scan_files(dir, parse_extensions(ext), recursive, verbose)]
@@ -0,0 +1,487 @@
+#!/usr/bin/env python
+# Software License Agreement (GNU GPLv3  License)
+#
+# Copyright (c) 2022, Roland Jung (rolandjung0@gmail.com)
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Header-only EXIF timestamp reader: reads just the APP1 segment of a JPEG (or the Exif item of a HEIC file) and
+# walks the TIFF IFDs until the date tag is found. No image is decoded and no tag dictionary is built.
+# The date tags are written in place the same way: they have a fixed size, so no other byte of the file changes.
+
+import struct
+from datetime import datetime
+
+TAG_MAKE = 0x010F
+TAG_MODEL = 0x0110
+TAG_ORIENTATION = 0x0112
+TAG_DATETIME = 0x0132
+TAG_THUMBNAIL_OFFSET = 0x0201  # JPEGInterchangeFormat of IFD1
+TAG_THUMBNAIL_LENGTH = 0x0202
+TAG_EXIF_IFD = 0x8769
+TAG_GPS_IFD = 0x8825
+TAG_DATETIME_ORIGINAL = 0x9003
+TAG_DATETIME_DIGITIZED = 0x9004
+TAG_PIXEL_X_DIMENSION = 0xA002
+TAG_PIXEL_Y_DIMENSION = 0xA003
+TAG_BODY_SERIAL_NUMBER = 0xA431
+# GPS IFD:
+TAG_GPS_LATITUDE_REF = 0x0001
+TAG_GPS_LATITUDE = 0x0002
+TAG_GPS_LONGITUDE_REF = 0x0003
+TAG_GPS_LONGITUDE = 0x0004
+TAG_GPS_ALTITUDE_REF = 0x0005
+TAG_GPS_ALTITUDE = 0x0006
+
+TYPE_BYTE = 1
+TYPE_ASCII = 2
+TYPE_SHORT = 3
+TYPE_LONG = 4
+TYPE_RATIONAL = 5
+
+EXIF_HEADER = b'Exif\x00\x00'
+EXIF_DATETIME_FORMAT = '%Y:%m:%d %H:%M:%S'
+HEIF_BRANDS = [b'heic', b'heix', b'heim', b'heis', b'hevc', b'hevx', b'mif1', b'msf1', b'avif']
+
+
+def _read_box_header(f):
+    # returns (type, payload size) of the next ISO-BMFF box or (None, 0) at EOF; payload size -1 means until EOF
+    header = f.read(8)
+    if len(header) < 8:
+        return None, 0
+    size, box_type = struct.unpack('>I4s', header)
+    if size == 1:
+        size = struct.unpack('>Q', f.read(8))[0] - 16
+    elif size == 0:
+        size = -1
+    else:
+        size -= 8
+    return box_type, size
+
+
+def _iter_boxes(data, pos, end):
+    # iterates over (type, payload start, payload end) of the boxes in data[pos:end]
+    while pos + 8 <= end:
+        size, box_type = struct.unpack_from('>I4s', data, pos)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from('>Q', data, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            return
+        yield box_type, pos + header, min(pos + size, end)
+        pos += size
+
+
+def _read_uint(data, pos, size):
+    if size == 0:
+        return 0, pos
+    if size == 2:
+        return struct.unpack_from('>H', data, pos)[0], pos + 2
+    if size == 4:
+        return struct.unpack_from('>I', data, pos)[0], pos + 4
+    if size == 8:
+        return struct.unpack_from('>Q', data, pos)[0], pos + 8
+    raise ValueError("invalid field size %s" % size)
+
+
+def _find_heif_exif_item(meta, pos, end):
+    # returns a list of (offset, length) extents of the Exif item of the 'meta' box payload
+    exif_id = None
+    locations = {}
+    for box_type, start, stop in _iter_boxes(meta, pos + 4, end):  # meta is a FullBox
+        if box_type == b'iinf':
+            version = meta[start]
+            p = start + 4
+            if version == 0:
+                p += 2
+            else:
+                p += 4
+            for infe_type, infe_start, infe_stop in _iter_boxes(meta, p, stop):
+                infe_version = meta[infe_start]
+                if infe_type != b'infe' or infe_version < 2:
+                    continue
+                q = infe_start + 4
+                if infe_version == 2:
+                    item_id, q = _read_uint(meta, q, 2)
+                else:
+                    item_id, q = _read_uint(meta, q, 4)
+                item_type = meta[q + 2:q + 6]
+                if item_type == b'Exif':
+                    exif_id = item_id
+                    break
+        elif box_type == b'iloc':
+            version = meta[start]
+            p = start + 4
+            offset_size = meta[p] >> 4
+            length_size = meta[p] & 0x0F
+            base_offset_size = meta[p + 1] >> 4
+            index_size = (meta[p + 1] & 0x0F) if version in [1, 2] else 0
+            p += 2
+            item_count, p = _read_uint(meta, p, 2 if version < 2 else 4)
+            for _ in range(item_count):
+                item_id, p = _read_uint(meta, p, 2 if version < 2 else 4)
+                construction_method = 0
+                if version in [1, 2]:
+                    construction_method = struct.unpack_from('>H', meta, p)[0] & 0x0F
+                    p += 2
+                p += 2  # data_reference_index
+                base_offset, p = _read_uint(meta, p, base_offset_size)
+                extent_count, p = _read_uint(meta, p, 2)
+                extents = []
+                for _ in range(extent_count):
+                    _, p = _read_uint(meta, p, index_size)
+                    extent_offset, p = _read_uint(meta, p, offset_size)
+                    extent_length, p = _read_uint(meta, p, length_size)
+                    extents.append((base_offset + extent_offset, extent_length))
+                if construction_method == 0:  # file offsets only
+                    locations[item_id] = extents
+
+    if exif_id is None:
+        return None
+    return locations.get(exif_id)
+
+
+def _read_heif_exif(f):
+    # returns (TIFF block of the Exif item, its file offset or None if it is split into several extents) or
+    # (None, None)
+    f.seek(0)
+    box_type, size = _read_box_header(f)
+    if box_type != b'ftyp' or size < 8:
+        raise ValueError("not an ISO-BMFF file")
+    f.seek(size, 1)
+
+    while True:
+        box_type, size = _read_box_header(f)
+        if box_type is None:
+            return None, None
+        if box_type == b'meta':
+            meta = f.read(size) if size >= 0 else f.read()
+            break
+        if size < 0:
+            return None, None
+        f.seek(size, 1)
+
+    extents = _find_heif_exif_item(meta, 0, len(meta))
+    if not extents:
+        return None, None
+    data = b''
+    for offset, length in extents:
+        f.seek(offset)
+        data += f.read(length)
+
+    # the item starts with the offset to the TIFF header (usually pointing behind an 'Exif\0\0' header)
+    if len(data) < 4:
+        return None, None
+    tiff_offset = struct.unpack_from('>I', data, 0)[0] + 4
+    return data[tiff_offset:], extents[0][0] + tiff_offset if len(extents) == 1 else None
+
+
+def _read_jpeg_exif(f):
+    # returns (TIFF block of the APP1 Exif segment, its file offset) or (None, None)
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None, None
+        while marker[1] == 0xFF:  # fill bytes
+            marker = marker[1:] + f.read(1)
+        code = marker[1]
+        if code == 0xD8 or code == 0x01 or 0xD0 <= code <= 0xD7:
+            continue
+        if code == 0xDA or code == 0xD9:  # start of scan / end of image: no more headers
+            return None, None
+        length = struct.unpack('>H', f.read(2))[0]
+        if code == 0xE1:
+            start = f.tell()
+            data = f.read(length - 2)
+            if data.startswith(EXIF_HEADER):
+                return data[len(EXIF_HEADER):], start + len(EXIF_HEADER)
+        else:
+            f.seek(length - 2, 1)
+
+
+def _get_ifd_values(tiff, endian, ifd_offset, tags):
+    # walks one IFD and returns {tag: value} for the requested BYTE/ASCII/SHORT/LONG/RATIONAL tags; RATIONAL values
+    # are floats, or tuples of floats for several values
+    values = {}
+    count = struct.unpack_from(endian + 'H', tiff, ifd_offset)[0]
+    pos = ifd_offset + 2
+    for _ in range(count):
+        tag, tag_type, n = struct.unpack_from(endian + 'HHI', tiff, pos)
+        if tag in tags:
+            if tag_type == TYPE_ASCII:
+                if n <= 4:
+                    raw = tiff[pos + 8:pos + 8 + n]
+                else:
+                    value_offset = struct.unpack_from(endian + 'I', tiff, pos + 8)[0]
+                    raw = tiff[value_offset:value_offset + n]
+                values[tag] = raw.split(b'\x00', 1)[0].decode('ascii', errors='replace').strip()
+            elif tag_type == TYPE_SHORT:
+                values[tag] = struct.unpack_from(endian + 'H', tiff, pos + 8)[0]
+            elif tag_type == TYPE_LONG:
+                values[tag] = struct.unpack_from(endian + 'I', tiff, pos + 8)[0]
+            elif tag_type == TYPE_BYTE:
+                values[tag] = tiff[pos + 8]
+            elif tag_type == TYPE_RATIONAL:
+                value_offset = struct.unpack_from(endian + 'I', tiff, pos + 8)[0]
+                raw = struct.unpack_from(endian + '%dI' % (2 * n), tiff, value_offset)
+                rationals = tuple(float(raw[i]) / raw[i + 1] if raw[i + 1] else 0.0 for i in range(0, 2 * n, 2))
+                values[tag] = rationals[0] if n == 1 else rationals
+            if len(values) == len(tags):
+                break
+        pos += 12
+    return values
+
+
+def _get_endian(tiff):
+    if tiff[:4] == b'II*\x00':
+        return '<'
+    if tiff[:4] == b'MM\x00*':
+        return '>'
+    return None
+
+
+def get_datetime_str_from_tiff(tiff):
+    # returns DateTimeOriginal or DateTime of a TIFF/EXIF block or None
+    endian = _get_endian(tiff)
+    if endian is None:
+        return None
+
+    ifd0 = struct.unpack_from(endian + 'I', tiff, 4)[0]
+    values = _get_ifd_values(tiff, endian, ifd0, [TAG_DATETIME, TAG_EXIF_IFD])
+    if TAG_EXIF_IFD in values:
+        exif_values = _get_ifd_values(tiff, endian, values[TAG_EXIF_IFD], [TAG_DATETIME_ORIGINAL])
+        if exif_values.get(TAG_DATETIME_ORIGINAL):
+            return exif_values[TAG_DATETIME_ORIGINAL]
+    return values.get(TAG_DATETIME) or None
+
+
+def get_device_from_tiff(tiff):
+    # returns (make, model, serial number) of the camera, '' for missing tags, or None without make and model
+    endian = _get_endian(tiff)
+    if endian is None:
+        return None
+
+    ifd0 = struct.unpack_from(endian + 'I', tiff, 4)[0]
+    values = _get_ifd_values(tiff, endian, ifd0, [TAG_MAKE, TAG_MODEL, TAG_EXIF_IFD])
+    if not values.get(TAG_MAKE) and not values.get(TAG_MODEL):
+        return None
+    serial = ''
+    if TAG_EXIF_IFD in values:
+        serial = _get_ifd_values(tiff, endian, values[TAG_EXIF_IFD], [TAG_BODY_SERIAL_NUMBER]).get(
+            TAG_BODY_SERIAL_NUMBER, '')
+    return values.get(TAG_MAKE, ''), values.get(TAG_MODEL, ''), serial
+
+
+def _get_gps_coordinate(values, tag, ref_tag, negative_ref):
+    # degrees, minutes, seconds -> signed degrees or None
+    dms = values.get(tag)
+    if not isinstance(dms, tuple) or len(dms) != 3:
+        return None
+    degrees = dms[0] + dms[1] / 60.0 + dms[2] / 3600.0
+    return -degrees if values.get(ref_tag, '').upper() == negative_ref else degrees
+
+
+def get_tags_from_tiff(tiff):
+    """
+    Returns {'datetime', 'make', 'model', 'serial', 'orientation', 'width', 'height', 'latitude', 'longitude',
+    'altitude'} of a TIFF/EXIF block; missing tags are None. The GPS position is given in degrees and meters.
+    """
+    tags = dict((name, None) for name in ['datetime', 'make', 'model', 'serial', 'orientation', 'width', 'height',
+                                          'latitude', 'longitude', 'altitude'])
+    endian = _get_endian(tiff)
+    if endian is None:
+        return tags
+
+    ifd0 = struct.unpack_from(endian + 'I', tiff, 4)[0]
+    values = _get_ifd_values(tiff, endian, ifd0, [TAG_MAKE, TAG_MODEL, TAG_ORIENTATION, TAG_DATETIME, TAG_EXIF_IFD,
+                                                  TAG_GPS_IFD])
+    tags['make'] = values.get(TAG_MAKE) or None
+    tags['model'] = values.get(TAG_MODEL) or None
+    tags['orientation'] = values.get(TAG_ORIENTATION)
+    tags['datetime'] = values.get(TAG_DATETIME) or None
+    if TAG_EXIF_IFD in values:
+        exif_values = _get_ifd_values(tiff, endian, values[TAG_EXIF_IFD], [
+            TAG_DATETIME_ORIGINAL, TAG_BODY_SERIAL_NUMBER, TAG_PIXEL_X_DIMENSION, TAG_PIXEL_Y_DIMENSION])
+        tags['datetime'] = exif_values.get(TAG_DATETIME_ORIGINAL) or tags['datetime']
+        tags['serial'] = exif_values.get(TAG_BODY_SERIAL_NUMBER) or None
+        tags['width'] = exif_values.get(TAG_PIXEL_X_DIMENSION)
+        tags['height'] = exif_values.get(TAG_PIXEL_Y_DIMENSION)
+    if TAG_GPS_IFD in values:
+        gps_values = _get_ifd_values(tiff, endian, values[TAG_GPS_IFD], [
+            TAG_GPS_LATITUDE_REF, TAG_GPS_LATITUDE, TAG_GPS_LONGITUDE_REF, TAG_GPS_LONGITUDE, TAG_GPS_ALTITUDE_REF,
+            TAG_GPS_ALTITUDE])
+        tags['latitude'] = _get_gps_coordinate(gps_values, TAG_GPS_LATITUDE, TAG_GPS_LATITUDE_REF, 'S')
+        tags['longitude'] = _get_gps_coordinate(gps_values, TAG_GPS_LONGITUDE, TAG_GPS_LONGITUDE_REF, 'W')
+        altitude = gps_values.get(TAG_GPS_ALTITUDE)
+        if isinstance(altitude, float):
+            tags['altitude'] = -altitude if gps_values.get(TAG_GPS_ALTITUDE_REF) == 1 else altitude
+    return tags
+
+
+def get_thumbnail_from_tiff(tiff):
+    # returns (JPEG data of the embedded thumbnail (IFD1) or None, orientation of the image or None)
+    endian = _get_endian(tiff)
+    if endian is None:
+        return None, None
+
+    ifd0 = struct.unpack_from(endian + 'I', tiff, 4)[0]
+    orientation = _get_ifd_values(tiff, endian, ifd0, [TAG_ORIENTATION]).get(TAG_ORIENTATION)
+    count = struct.unpack_from(endian + 'H', tiff, ifd0)[0]
+    ifd1 = struct.unpack_from(endian + 'I', tiff, ifd0 + 2 + 12 * count)[0]
+    if not ifd1:
+        return None, orientation
+    values = _get_ifd_values(tiff, endian, ifd1, [TAG_THUMBNAIL_OFFSET, TAG_THUMBNAIL_LENGTH])
+    offset, length = values.get(TAG_THUMBNAIL_OFFSET), values.get(TAG_THUMBNAIL_LENGTH)
+    if not offset or not length:
+        return None, orientation
+    data = tiff[offset:offset + length]
+    if len(data) != length or data[:2] != b'\xff\xd8':
+        return None, orientation
+    return data, orientation
+
+
+def read_exif_thumbnail(fn):
+    # returns (JPEG data of the embedded EXIF thumbnail or None, orientation or None) without decoding the image
+    tiff, parsed = read_exif_block(fn)
+    if tiff is None:
+        return None, None
+    try:
+        return get_thumbnail_from_tiff(tiff)
+    except (ValueError, IndexError, struct.error):
+        return None, None
+
+
+def read_exif_device(fn):
+    # returns (make, model, serial number) of the camera that took the image or None, without decoding the image
+    tiff, parsed = read_exif_block(fn)
+    if tiff is None:
+        return None
+    try:
+        return get_device_from_tiff(tiff)
+    except (ValueError, IndexError, struct.error):
+        return None
+
+
+def read_exif_tags(fn):
+    # returns (tags of get_tags_from_tiff() or None, parsed) without decoding the image, see read_exif_datetime()
+    tiff, parsed = read_exif_block(fn)
+    if tiff is None:
+        return None, parsed
+    try:
+        return get_tags_from_tiff(tiff), True
+    except (ValueError, IndexError, struct.error):
+        return None, False
+
+
+def _read_exif_block(f):
+    # returns (tiff_block, file offset of the block, parsed), see read_exif_block()
+    head = f.read(12)
+    if head[:2] == b'\xff\xd8':
+        return _read_jpeg_exif(f) + (True,)
+    if head[4:8] == b'ftyp' and head[8:12] in HEIF_BRANDS:
+        return _read_heif_exif(f) + (True,)
+    return None, None, False
+
+
+def read_exif_block(fn):
+    # returns (tiff_block, parsed): parsed is False if the file is neither a JPEG nor a HEIF file or is corrupted
+    try:
+        with open(fn, 'rb') as f:
+            tiff, offset, parsed = _read_exif_block(f)
+            return tiff, parsed
+    except (OSError, ValueError, IndexError, struct.error):
+        pass
+    return None, False
+
+
+def _get_ascii_positions(tiff, endian, ifd_offset, tags):
+    # returns {tag: (position in tiff, size)} of the requested ASCII tags of one IFD
+    positions = {}
+    count = struct.unpack_from(endian + 'H', tiff, ifd_offset)[0]
+    pos = ifd_offset + 2
+    for _ in range(count):
+        tag, tag_type, n = struct.unpack_from(endian + 'HHI', tiff, pos)
+        if tag in tags and tag_type == TYPE_ASCII:
+            value_pos = pos + 8 if n <= 4 else struct.unpack_from(endian + 'I', tiff, pos + 8)[0]
+            positions[tag] = (value_pos, n)
+        pos += 12
+    return positions
+
+
+def get_datetime_positions(tiff):
+    # returns {tag: (position in tiff, size)} of DateTime, DateTimeOriginal and DateTimeDigitized
+    endian = _get_endian(tiff)
+    if endian is None:
+        return {}
+
+    ifd0 = struct.unpack_from(endian + 'I', tiff, 4)[0]
+    positions = _get_ascii_positions(tiff, endian, ifd0, [TAG_DATETIME])
+    exif_ifd = _get_ifd_values(tiff, endian, ifd0, [TAG_EXIF_IFD]).get(TAG_EXIF_IFD)
+    if exif_ifd:
+        positions.update(_get_ascii_positions(tiff, endian, exif_ifd, [TAG_DATETIME_ORIGINAL, TAG_DATETIME_DIGITIZED]))
+    return positions
+
+
+def write_exif_datetime(fn, datetime_object):
+    """
+    Sets the 'DateTimeOriginal' (or 'DateTime') EXIF tag of a JPEG or HEIC file to datetime_object and shifts the other
+    date tags by the same amount. Only the date strings are overwritten in place; the image is not decoded.
+    Returns the number of changed tags; raises ValueError if the file has no EXIF date that can be written in place.
+    """
+    with open(fn, 'r+b') as f:
+        try:
+            tiff, offset, parsed = _read_exif_block(f)
+            positions = get_datetime_positions(tiff) if tiff is not None else {}
+        except (IndexError, struct.error):
+            raise ValueError("corrupted EXIF data")
+        if offset is None:
+            raise ValueError("no EXIF data that can be written in place")
+
+        values = {}
+        for tag, (pos, size) in positions.items():
+            try:
+                value = tiff[pos:pos + size].split(b'\x00', 1)[0].decode('ascii')
+                values[tag] = datetime.strptime(value, EXIF_DATETIME_FORMAT)
+            except ValueError:
+                pass  # empty or invalid, e.g. '    :  :     :  :  '
+        reference = values.get(TAG_DATETIME_ORIGINAL) or values.get(TAG_DATETIME)
+        if reference is None:
+            raise ValueError("no EXIF date")
+        shift = datetime_object - reference
+        if not shift:
+            return 0
+
+        for tag, value in values.items():
+            pos, size = positions[tag]
+            f.seek(offset + pos)
+            f.write((value + shift).strftime(EXIF_DATETIME_FORMAT).encode('ascii').ljust(size, b'\x00')[:size])
+        return len(values)
+
+
+def read_exif_datetime(fn):
+    """
+    Reads the 'DateTimeOriginal' (or 'DateTime') EXIF string of a JPEG or HEIC file without decoding the image.
+    Returns (datetime_str, parsed): datetime_str is None if the file has no date tag; parsed is False if the file
+    could not be handled here and a full decoder (Pillow) has to be used instead.
+    """
+    tiff, parsed = read_exif_block(fn)
+    if tiff is None:
+        return None, parsed
+    try:
+        return get_datetime_str_from_tiff(tiff), True
+    except (ValueError, IndexError, struct.error):
+        return None, False
@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+# Software License Agreement (GNU GPLv3  License)
+#
+# Copyright (c) 2022, Roland Jung (rolandjung0@gmail.com)
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Persistent metadata index: remembers the extracted timestamp and the destination of every processed file, keyed
+# by (path, size, mtime). Entries of modified files are invalidated by their key, entries of files that were not
+# seen for MAX_AGE_DAYS are evicted when the index is closed.
+# Every shard of a sharded run (--shard) works on a copy of the index, the copies are merged by merge.py.
+
+import os
+import time
+import sqlite3
+import threading
+from datetime import datetime
+
+INDEX_FILENAME = '.py_image_modifier.db'
+INDEX_SHARD_FILENAME = '.py_image_modifier.%s.db'
+# tables and how their rows are matched, see merge()
+TABLES = [('files', 'm.path = o.path'), ('hashes', 'm.path = o.path'),
+          ('phashes', 'm.path = o.path AND m.method = o.method')]
+MAX_AGE_DAYS = 30
+COMMIT_INTERVAL = 1000
+
+
+def get_file_key(fn, entry=None):
+    # returns the index key (path, size, mtime_ns) of a file; the cached stat of an os.DirEntry is used if given
+    stat = entry.stat() if entry is not None else os.stat(fn)
+    return os.path.abspath(fn), stat.st_size, stat.st_mtime_ns
+
+
+def datetime_to_str(datetime_object):
+    return datetime_object.strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+def str_to_datetime(datetime_str):
+    return datetime.strptime(datetime_str, '%Y-%m-%d %H:%M:%S.%f')
+
+
+class IndexEntry(object):
+    __slots__ = ['datetime', 'source', 'destination']
+
+    def __init__(self, datetime_object, source, destination):
+        self.datetime = datetime_object
+        self.source = source  # 'exif' or 'mtime'
+        self.destination = destination
+
+
+class MetadataIndex(object):
+    def __init__(self, db_file, max_age_days=MAX_AGE_DAYS):
+        self.db_file = db_file
+        self.max_age_days = max_age_days
+        self.run_time = time.time()
+        self.num_changes = 0
+        # the index is shared by the I/O threads:
+        self.lock = threading.RLock()
+        self.con = sqlite3.connect(db_file, check_same_thread=False)
+        self.con.execute('CREATE TABLE IF NOT EXISTS files ('
+                         'path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, '
+                         'datetime TEXT, source TEXT, destination TEXT, last_seen REAL)')
+        self.con.execute('CREATE TABLE IF NOT EXISTS hashes ('
+                         'path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, '
+                         'hash TEXT, destination TEXT, last_seen REAL)')
+        self.con.execute('CREATE TABLE IF NOT EXISTS phashes ('
+                         'path TEXT, method TEXT, size INTEGER, mtime_ns INTEGER, '
+                         'hash TEXT, destination TEXT, last_seen REAL, PRIMARY KEY (path, method))')
+
+    @staticmethod
+    def in_dir(dir, dry_run=False, shard_name=None):
+        db_file = os.path.join(dir, INDEX_FILENAME)
+        if not dry_run and shard_name is None:
+            return MetadataIndex(db_file)
+        if dry_run:
+            # a dry run works on an in-memory copy, the changes are dropped
+            index = MetadataIndex(':memory:')
+        else:
+            # a shard works on a copy of its own, a resumed shard continues its copy
+            shard_file = os.path.join(dir, INDEX_SHARD_FILENAME % shard_name)
+            if os.path.exists(shard_file):
+                return MetadataIndex(shard_file)
+            index = MetadataIndex(shard_file)
+        if os.path.exists(db_file):
+            con = sqlite3.connect('file:%s?mode=ro' % db_file, uri=True)
+            con.backup(index.con)
+            con.close()
+        return index
+
+    def merge(self, db_file):
+        # takes the entries of another index (a shard) that were seen later than the own entries
+        with self.lock:
+            self.con.execute('ATTACH DATABASE ? AS other', (db_file,))
+            try:
+                for table, match in TABLES:
+                    self.con.execute('INSERT OR REPLACE INTO main.%s SELECT * FROM other.%s AS o WHERE o.last_seen > '
+                                     'COALESCE((SELECT m.last_seen FROM main.%s AS m WHERE %s), -1)'
+                                     % (table, table, table, match))
+                self.con.commit()
+            finally:
+                self.con.execute('DETACH DATABASE other')
+
+    def get(self, key):
+        # returns the IndexEntry of an unchanged file or None
+        path, size, mtime_ns = key
+        with self.lock:
+            row = self.con.execute('SELECT size, mtime_ns, datetime, source, destination FROM files WHERE path=?',
+                                   (path,)).fetchone()
+            if row is None or row[0] != size or row[1] != mtime_ns:
+                return None
+
+            self.con.execute('UPDATE files SET last_seen=? WHERE path=?', (self.run_time, path))
+            self._changed()
+            return IndexEntry(str_to_datetime(row[2]), row[3], row[4])
+
+    def put(self, key, datetime_object, source, destination=None):
+        path, size, mtime_ns = key
+        with self.lock:
+            self.con.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)',
+                             (path, size, mtime_ns, datetime_to_str(datetime_object), source, destination,
+                              self.run_time))
+            self._changed()
+
+    def set_destination(self, key, destination):
+        with self.lock:
+            self.con.execute('UPDATE files SET destination=? WHERE path=?', (destination, key[0]))
+            self._changed()
+
+    def get_hash(self, key):
+        # returns the content hash of an unchanged file or None
+        path, size, mtime_ns = key
+        with self.lock:
+            row = self.con.execute('SELECT size, mtime_ns, hash FROM hashes WHERE path=?', (path,)).fetchone()
+            if row is None or row[0] != size or row[1] != mtime_ns:
+                return None
+
+            self.con.execute('UPDATE hashes SET last_seen=? WHERE path=?', (self.run_time, path))
+            self._changed()
+            return row[2]
+
+    def put_hash(self, key, digest):
+        path, size, mtime_ns = key
+        with self.lock:
+            self.con.execute('INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, NULL, ?)',
+                             (path, size, mtime_ns, digest, self.run_time))
+            self._changed()
+
+    def set_hash_destination(self, key, digest, destination):
+        # digest is None for files that were not hashed; a cached hash of the unchanged file is kept then
+        path, size, mtime_ns = key
+        with self.lock:
+            self.con.execute('INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, COALESCE(?, (SELECT hash FROM hashes '
+                             'WHERE path=? AND size=? AND mtime_ns=?)), ?, ?)',
+                             (path, size, mtime_ns, digest, path, size, mtime_ns, destination, self.run_time))
+            self._changed()
+
+    def get_transferred_hashes(self):
+        # returns [(path, size, mtime_ns, hash, destination)] of all files that were transferred by previous runs;
+        # hash is None for files that were not hashed
+        with self.lock:
+            return self.con.execute('SELECT path, size, mtime_ns, hash, destination FROM hashes '
+                                    'WHERE destination IS NOT NULL').fetchall()
+
+    def get_phash(self, key, method):
+        # returns the perceptual hash (hex) of an unchanged image or None
+        path, size, mtime_ns = key
+        with self.lock:
+            row = self.con.execute('SELECT size, mtime_ns, hash FROM phashes WHERE path=? AND method=?',
+                                   (path, method)).fetchone()
+            if row is None or row[0] != size or row[1] != mtime_ns:
+                return None
+
+            self.con.execute('UPDATE phashes SET last_seen=? WHERE path=? AND method=?', (self.run_time, path, method))
+            self._changed()
+            return row[2]
+
+    def put_phash(self, key, method, h):
+        path, size, mtime_ns = key
+        with self.lock:
+            self.con.execute('INSERT OR REPLACE INTO phashes VALUES (?, ?, ?, ?, ?, NULL, ?)',
+                             (path, method, size, mtime_ns, h, self.run_time))
+            self._changed()
+
+    def set_phash_destination(self, key, method, destination):
+        with self.lock:
+            self.con.execute('UPDATE phashes SET destination=? WHERE path=? AND method=?',
+                             (destination, key[0], method))
+            self._changed()
+
+    def get_transferred_phashes(self, method):
+        # returns [(hash, destination)] of all perceptually hashed images that were transferred by previous runs
+        with self.lock:
+            return self.con.execute('SELECT hash, destination FROM phashes '
+                                    'WHERE method=? AND destination IS NOT NULL', (method,)).fetchall()
+
+    def evict(self):
+        # removes all entries that were not seen for max_age_days
+        with self.lock:
+            deadline = self.run_time - self.max_age_days * 24 * 3600
+            cnt = self.con.execute('DELETE FROM files WHERE last_seen < ?', (deadline,)).rowcount
+            cnt += self.con.execute('DELETE FROM hashes WHERE last_seen < ?', (deadline,)).rowcount
+            cnt += self.con.execute('DELETE FROM phashes WHERE last_seen < ?', (deadline,)).rowcount
+            self.con.commit()
+            return cnt
+
+    def commit(self):
+        with self.lock:
+            self.con.commit()
+
+    def close(self):
+        with self.lock:
+            self.evict()
+            self.con.close()
+
+    def _changed(self):
+        # called with the lock held
+        self.num_changes += 1
+        if self.num_changes % COMMIT_INTERVAL == 0:
+            self.con.commit()
+
+    def lookup(self, fn, dir_entry=None):
+        # returns (key, entry): key is None if the file cannot be accessed, entry is None for new or changed files
+        try:
+            key = get_file_key(fn, dir_entry)
+        except OSError:
+            return None, None
+        return key, self.get(key)
+
+    def is_done(self, entry):
+        # True if the file was already transferred in a previous run and the result still exists
+        return entry is not None and entry.destination is not None and os.path.exists(entry.destination)
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# Software License Agreement (GNU GPLv3  License)
+#
+# Copyright (c) 2022, Roland Jung (rolandjung0@gmail.com)
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# I/O engine for latency bound sources (ifuse, NFS): the blocking stat/read/copy calls run in a thread pool, so that
+# up to <depth> of them are in flight at the same time. The achieved throughput is measured for tuning the depth.
+
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from py_image_modifier.common import IO_DEPTH
+from py_image_modifier.transfer import transfer_file
+
+
+class IoEngine(object):
+    def __init__(self, depth=IO_DEPTH):
+        self.depth = max(1, depth)
+        self.executor = ThreadPoolExecutor(max_workers=self.depth)
+        self.lock = threading.Lock()
+        self.t_start = time.perf_counter()
+        self.num_files = 0
+        self.num_bytes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def map_ordered(self, func, iterable):
+        # yields (item, func(item)) in the order of iterable, while up to depth calls are running
+        pending = deque()
+        for item in iterable:
+            pending.append((item, self.executor.submit(func, item)))
+            if len(pending) >= self.depth:
+                item, future = pending.popleft()
+                yield item, future.result()
+        while pending:
+            item, future = pending.popleft()
+            yield item, future.result()
+
+    def submit(self, func, *args):
+        return self.executor.submit(func, *args)
+
+    def transfer(self, src, dst, mode, datetime_object=None):
+        # returns (error, success); runs in the I/O threads
+        try:
+            warning = transfer_file(src, dst, mode, datetime_object)
+        except (OSError, ValueError) as e:
+            return str(e), False
+        if warning is not None:
+            print("EXIF dates not written, copied unchanged: %s (%s)" % (src, warning))
+        return None, True
+
+    def count(self, num_bytes):
+        with self.lock:
+            self.num_files += 1
+            self.num_bytes += num_bytes
+
+    def get_throughput_str(self):
+        duration = max(time.perf_counter() - self.t_start, 1e-9)
+        return "throughput: %.1f files/s, %.1f MB/s (io_depth %d)" % (
+            self.num_files / duration, self.num_bytes / duration / 1e6, self.depth)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# Software License Agreement (GNU GPLv3  License)
+#
+# Copyright (c) 2022, Roland Jung (rolandjung0@gmail.com)
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Run journal: every finished source->destination pair is appended to a journal file in the output directory, so
+# that an interrupted run can be resumed. Destination files are written under a temporary name and renamed once
+# complete, so a killed run never leaves half-written images behind; the temporary files it leaves are removed by the
+# next run (see remove_temp_files()).
+# Every shard of a sharded run (--shard) writes a journal of its own, see merge.py.
+
+import os
+import json
+
+JOURNAL_FILENAME = '.py_image_modifier.%s.journal'
+SHARD_NAME = 'shard-%d-of-%d'
+TEMP_PREFIX = '.tmp.'
+# the temporary file of a move holds the only copy of the source, see remove_temp_files()
+MOVE_PREFIX = TEMP_PREFIX + 'move.'
+
+
+def get_temp_filename(fn, prefix=TEMP_PREFIX):
+    # temporary name in the same directory (same filesystem for os.replace), the extension is kept
+    dir, name = os.path.split(fn)
+    return os.path.join(dir, prefix + name)
+
+
+def remove_temp_files(dir):
+    # removes the temporary files a killed run left in dir; returns the ones of killed moves, which are kept
+    kept = []
+    try:
+        entries = list(os.scandir(dir))
+    except OSError:
+        return kept
+    for entry in entries:
+        if not entry.name.startswith(TEMP_PREFIX) or entry.is_dir(follow_symlinks=False):
+            continue
+        if entry.name.startswith(MOVE_PREFIX):
+            kept.append(entry.path)
+            continue
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+    return kept
+
+
+class RunJournal(object):
+    def __init__(self, journal_file, resume=False, dry_run=False, remember=False):
+        # remember: keep the files of this run in memory as well (watch mode reports files twice)
+        self.journal_file = journal_file
+        self.remember = remember
+        self.done = {}
+        self.file = None
+        if resume and os.path.exists(journal_file):
+            self.done = self.load(journal_file)
+        if dry_run:
+            return
+        if resume:
+            self.file = open(journal_file, 'a')
+        else:
+            self.file = open(journal_file, 'w')
+
+    @staticmethod
+    def in_dir(dir, tool, resume=False, dry_run=False, remember=False, shard=None):
+        if shard is None:
+            return RunJournal(os.path.join(dir, JOURNAL_FILENAME % tool), resume, dry_run, remember)
+        journal = RunJournal(os.path.join(dir, JOURNAL_FILENAME % (tool + '.' + SHARD_NAME % shard)), resume, dry_run,
+                             remember)
+        # the journals of the shards are merged into the journal of the tool:
+        journal_file = os.path.join(dir, JOURNAL_FILENAME % tool)
+        if resume and os.path.exists(journal_file):
+            merged = RunJournal.load(journal_file)
+            merged.update(journal.done)
+            journal.done = merged
+        return journal
+
+    @staticmethod
+    def load(journal_file):
+        done = {}
+        with open(journal_file, 'r') as f:
+            for line in f:
+                if not line.endswith('\n'):
+                    break  # torn write of a killed run
+                try:
+                    src, dst = json.loads(line)
+                except ValueError:
+                    continue
+                done[src] = dst
+        return done
+
+    def get(self, src):
+        # returns the destination of an already processed source file or None
+        return self.done.get(os.path.abspath(src))
+
+    def add(self, src, dst):
+        src = os.path.abspath(src)
+        if self.remember:
+            self.done[src] = dst
+        self.file.write(json.dumps([src, dst]) + '\n')
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# Software License Agreement (GNU GPLv3  License)
+#
+# Copyright (c) 2022, Roland Jung (rolandjung0@gmail.com)
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# merge subcommand: combines the results of a sharded run (--shard i/N) once all shards are done. The shards never
+# write to the same file - every shard has a journal and a copy of the index of its own, and destination names are
+# claimed by exclusive claim files (naming.py) - so they need no locks while they run. The merge appends the shard
+# journals to the journal of the tool, takes the newer entries of the shard indices into the index and removes the
+# claim files.
+
+import os
+import re
+
+from py_image_modifier.common import exit_success, exit_failure
+
+HELP = 'merges the results of the shards of a sharded run (--shard) in the output_dir'
+DESCRIPTION = 'Merging the journals, indices and name claims of all shards (--shard i/N) of a run in the output_dir, once all shards are done:\n usage: --output_dir ../test/rename_out'
+
+SHARD_JOURNAL_PATTERN = re.compile(r'^\.py_image_modifier\.(.+)\.shard-\d+-of-\d+\.journal$')
+SHARD_INDEX_PATTERN = re.compile(r'^\.py_image_modifier\.shard-\d+-of-\d+\.db$')
+
+
+def merge_journals(dir, journal_files):
+    # appends the entries of the shard journals to the journals of their tools; returns the number of entries
+    from py_image_modifier.journal import RunJournal, JOURNAL_FILENAME
+
+    num_entries = 0
+    for name in sorted(journal_files):
+        tool = SHARD_JOURNAL_PATTERN.match(name).group(1)
+        shard_file = os.path.join(dir, name)
+        done = RunJournal.load(shard_file)
+        journal = RunJournal(os.path.join(dir, JOURNAL_FILENAME % tool), resume=True)
+        for src, dst in done.items():
+            journal.add(src, dst)
+        journal.close()
+        os.remove(shard_file)
+        num_entries += len(done)
+    return num_entries
+
+
+def merge_indices(dir, index_files):
+    from py_image_modifier.index import MetadataIndex, INDEX_FILENAME
+
+    index = MetadataIndex(os.path.join(dir, INDEX_FILENAME))
+    try:
+        for name in sorted(index_files):
+            index.merge(os.path.join(dir, name))
+    finally:
+        index.close()
+    for name in index_files:
+        os.remove(os.path.join(dir, name))
+
+
+def remove_claims(dir):
+    # returns the number of removed claim files of the output tree
+    from py_image_modifier.naming import CLAIM_PREFIX
+
+    num_claims = 0
+    for root, dirs, files in os.walk(dir):
+        for name in files:
+            if name.startswith(CLAIM_PREFIX):
+                os.remove(os.path.join(root, name))
+                num_claims += 1
+    return num_claims
+
+
+def add_arguments(parser):
+    parser.add_argument('--output_dir', help='output_dir of the sharded run', default="")
+
+
+def run(args):
+    if args.output_dir == "":
+        print('no output_dir specified!')
+        exit_failure()
+    dir = os.path.abspath(args.output_dir)
+    if not os.path.isdir(dir):
+        print("is not a directory %s" % dir)
+        exit_failure()
+
+    names = os.listdir(dir)
+    journal_files = [name for name in names if SHARD_JOURNAL_PATTERN.match(name)]
+    index_files = [name for name in names if SHARD_INDEX_PATTERN.match(name)]
+    print("merged journal entries: %d (%d shard journals)" % (merge_journals(dir, journal_files), len(journal_files)))
+    if index_files:
+        merge_indices(dir, index_files)
+    print("merged indices: %d" % len(index_files))
+    print("removed name claims: %d" % remove_claims(dir))
+    exit_success()
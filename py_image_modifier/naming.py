@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# Software License Agreement (GNU GPLv3  License)
+#
+# Copyright (c) 2022, Roland Jung (rolandjung0@gmail.com)
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Destination name allocation: the listing of every target folder is loaded once, afterwards unique names are
+# handed out from memory instead of probing the disk with os.path.exists for every candidate.
+# Several processes (--shard) that write into the same folders claim every name by creating a hidden claim file
+# exclusively (O_EXCL, atomic on local filesystems and NFS), so no name is given out twice without any lock. The claims
+# stay until all shards are done and are removed by the merge step.
+
+import os
+import threading
+
+CLAIM_PREFIX = '.claim.'
+
+
+def get_claim_filename(fn):
+    dir, name = os.path.split(fn)
+    return os.path.join(dir, CLAIM_PREFIX + name)
+
+
+class NameAllocator(object):
+    def __init__(self, claim=False):
+        self.claim = claim
+        self.lock = threading.Lock()
+        self.names = {}  # dir -> set of taken names
+        self.next_number = {}  # (dir, first name) -> number to try next
+
+    def allocate(self, dir, make_name, get_siblings=None):
+        """
+        Returns the path of a free name in dir and reserves it. make_name(number) builds the candidates, number 0
+        is the name without counter. get_siblings(name) returns the names of further files that belong to name (e.g.
+        renditions), they have to be free as well and are reserved with it. Thread-safe.
+        """
+        dir = os.path.normpath(dir)
+        with self.lock:
+            names = self._get_names(dir)
+            first_name = make_name(0)
+            number = self.next_number.get((dir, first_name), 0)
+            while True:
+                name = make_name(number)
+                group = [name] + (get_siblings(name) if get_siblings is not None else [])
+                if names.isdisjoint(group) and (not self.claim or self._claim(dir, group)):
+                    break
+                names.update(group)  # claimed by another process
+                number += 1
+            names.update(group)
+            self.next_number[(dir, first_name)] = number + 1
+            return os.path.join(dir, name)
+
+    def clear(self):
+        # forgets the listings, once all allocated files exist on disk; the folders are listed again when needed
+        with self.lock:
+            self.names.clear()
+            self.next_number.clear()
+
+    def _get_names(self, dir):
+        names = self.names.get(dir)
+        if names is None:
+            try:
+                names = set(os.listdir(dir))
+            except OSError:  # the directory does not exist yet
+                names = set()
+            names.update([name[len(CLAIM_PREFIX):] for name in names if name.startswith(CLAIM_PREFIX)])
+            self.names[dir] = names
+        return names
+
+    def _claim(self, dir, group):
+        # returns True if all names of group were claimed, else no name of the group is claimed
+        if not os.path.isdir(dir):
+            os.makedirs(dir, 0o777, True)
+        claimed = []
+        for name in group:
+            claim_file = get_claim_filename(os.path.join(dir, name))
+            try:
+                os.close(os.open(claim_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666))
+            except FileExistsError:
+                for fn in claimed:
+                    os.remove(fn)
+                return False
+            claimed.append(claim_file)
+        return True
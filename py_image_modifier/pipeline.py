@@ -0,0 +1,466 @@
+#!/usr/bin/env python
+# Software License Agreement (GNU GPLv3  License)
+#
+# Copyright (c) 2022, Roland Jung (rolandjung0@gmail.com)
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# The loop shared by all tools: discover files, read their timestamp, skip finished/unchanged/duplicate files, allocate
+# a destination name and run the conversion or transfer of every file. The tools only implement the hooks below.
+# The heavy modules are imported in run(), so that building the command line stays fast.
+
+import os
+import itertools
+from collections import deque
+
+from py_image_modifier.common import exit_failure, get_datetime_and_source_from_entry
+
+
+class Pipeline(object):
+    tool = None  # name of the run journal
+    unit = 'files'
+    dedup_output_dir = False  # files already in the output_dir count as duplicates as well
+
+    def __init__(self, args):
+        from py_image_modifier.profiling import Profiler
+
+        self.args = args
+        self.profiler = Profiler(args.profile or bool(args.metrics))
+        self.total_cnt = 0
+        self.total_skipped = 0
+        self.total_error = 0
+        self.index = None
+        self.finder = None
+        self.similar = None
+        self.journal = None
+        self.engine = None
+        self.allocator = None
+        self.thumbnails = None
+        self.thumbnail_jobs = deque()
+        self.output_dir_root = None
+        self.input_root = None
+        self.shard = None  # (i, N) of --shard
+        self.cleaned_dirs = set()  # destination folders without temporary files of killed runs
+
+    # hooks:
+    def get_datetime(self, dir_entry):
+        # returns (datetime_object, source); runs in the I/O threads
+        return get_datetime_and_source_from_entry(dir_entry)
+
+    def get_device(self, dir_entry):
+        # returns the camera (make, model, serial number) or None; runs in the I/O threads
+        return None
+
+    def adjust_datetime(self, datetime_object, device):
+        return datetime_object
+
+    def make_name(self, file_orig, datetime_str, number):
+        raise NotImplementedError
+
+    def get_siblings(self, name):
+        # names of further output files of name, which need a free name as well
+        return []
+
+    def get_action(self):
+        # action of the planned jobs, e.g. 'convert' or the transfer mode
+        raise NotImplementedError
+
+    def start(self):
+        pass
+
+    def submit(self, item):
+        # runs the job of the PlanEntry item; returns a future of ((output, success), duration), see
+        # profiling.timed_call()
+        raise NotImplementedError
+
+    def max_in_flight(self):
+        return self.engine.depth
+
+    def stop(self):
+        pass
+
+    def read_file_info(self, dir_entry):
+        # runs in the I/O threads: returns (file_done, key, entry, datetime_object, source, stat, perceptual hash,
+        # device)
+        try:
+            st = dir_entry.stat()
+        except OSError:
+            st = None
+        file_done = self.journal.get(dir_entry.path)
+        if file_done is not None:
+            return file_done, None, None, None, None, st, None, None
+
+        key, entry = None, None
+        if self.args.index:
+            key, entry = self.index.lookup(dir_entry.path, dir_entry)
+        elif self.index is not None and st is not None:
+            # the key of the source is taken before it is moved away, see record()
+            from py_image_modifier.index import get_file_key
+            key = get_file_key(dir_entry.path, dir_entry)
+
+        if self.finder is not None and key is not None and not self.index.is_done(entry):
+            self.profiler.call('dedup_hash', self.finder.prepare, key)
+        h = None
+        if self.similar is not None:  # cached in the index
+            h = self.profiler.call('similar_hash', self.similar.hash, dir_entry.path, dir_entry)
+        device = self.get_device(dir_entry)
+        if entry is not None:
+            return None, key, entry, entry.datetime, entry.source, st, h, device
+
+        datetime_object, source = self.get_datetime(dir_entry)
+        return None, key, entry, datetime_object, source, st, h, device
+
+    def skip(self, dir_entry, file_done, entry, h=None):
+        # returns (reason, existing file) if the file was processed before or is a duplicate, else (None, None)
+        file_orig = dir_entry.path
+        if file_done is not None:
+            if self.args.verbose:
+                print("Done \n\t-src:" + file_orig + " \n\t-dest: " + file_done)
+            return 'done', file_done
+
+        if self.args.index and self.index.is_done(entry):
+            if self.args.verbose:
+                print("Unchanged \n\t-src:" + file_orig + " \n\t-dest: " + entry.destination)
+            return 'unchanged', entry.destination
+
+        if self.finder is not None:
+            file_dup = self.profiler.call('dedup', self.finder.find, file_orig, dir_entry)
+            if file_dup is not None:
+                if self.args.verbose:
+                    print("Duplicate \n\t-src:" + file_orig + " \n\t-same as: " + file_dup)
+                return 'duplicate', file_dup
+
+        if self.similar is not None and h is not None:
+            file_similar, distance = self.profiler.call('similar', self.similar.add, file_orig, h)
+            if file_similar is not None and self.args.skip_similar:
+                if self.args.verbose:
+                    print("Near-duplicate \n\t-src:" + file_orig + " \n\t-similar to: " + file_similar +
+                          " (distance %d)" % distance)
+                return 'near-duplicate', file_similar
+        return None, None
+
+    def get_destination(self, file_orig, datetime_object):
+        datetime_str = datetime_object.strftime('%Y%m%d_%H%M%S')
+
+        path = self.output_dir_root
+        if self.args.create_tree:
+            path = os.path.join(path, datetime_object.strftime("%Y"), datetime_object.strftime("%m"))
+
+        # create new filename that does not exist yet (the folders are created by execute()):
+        return self.allocator.allocate(path, lambda number: self.make_name(file_orig, datetime_str, number),
+                                       self.get_siblings)
+
+    def plan(self, files, pbar):
+        # reads the timestamps of all files and returns the list of PlanEntry; nothing is written yet
+        from py_image_modifier.plan import PlanEntry, SKIP, ERROR
+
+        plan = []
+        read_file_info = lambda dir_entry: self.profiler.call('metadata', self.read_file_info, dir_entry)
+        for dir_entry, info in self.engine.map_ordered(read_file_info, files):
+            file_done, key, entry, datetime_object, source, st, h, device = info
+            item = PlanEntry(dir_entry.path, key, st.st_size if st else 0, st.st_ino if st else 0)
+            item.datetime, item.datetime_source = datetime_object, source
+            plan.append(item)
+
+            item.reason, item.destination = self.skip(dir_entry, file_done, entry, h)
+            if item.reason is not None:
+                item.action = SKIP
+                self.total_skipped += 1
+                pbar.update(1)
+                continue
+
+            if datetime_object is None:
+                item.action = ERROR
+                item.reason = 'no timestamp'
+                self.total_error += 1
+                print("failure at: %s" % item.source)
+                pbar.update(1)
+                continue
+            if self.args.index and entry is None and key is not None:
+                self.profiler.call('index', self.index.put, key, datetime_object, source)
+
+            item.action = self.get_action()
+            item.datetime = self.adjust_datetime(datetime_object, device)
+            item.destination = self.profiler.call('naming', self.get_destination, item.source, item.datetime)
+            if self.args.dry_run:
+                pbar.update(1)
+        return plan
+
+    def execute(self, plan, pbar):
+        # creates the destination folders at once and runs the jobs of the plan in disk order
+        from py_image_modifier.plan import get_directories, sort_for_io
+        from py_image_modifier.journal import remove_temp_files
+
+        jobs_plan = sort_for_io([item for item in plan if item.is_job()])
+        for path in get_directories(jobs_plan):
+            if not os.path.isdir(path):
+                self.profiler.call('mkdir', os.makedirs, path, 0o777, True)
+                if self.args.verbose:
+                    print("directory created: %s" % path)
+            elif path not in self.cleaned_dirs and self.shard is None:
+                # the other shards may be writing into the same folders
+                self.cleaned_dirs.add(path)
+                for file_tmp in remove_temp_files(path):
+                    print("kept the file of a killed move: %s" % file_tmp)
+
+        jobs = deque()
+        for item in jobs_plan:
+            jobs.append((item, self.submit(item)))
+            # bound the number of queued jobs:
+            while len(jobs) >= self.max_in_flight():
+                self.finish(jobs.popleft(), pbar)
+
+        while jobs:
+            self.finish(jobs.popleft(), pbar)
+        while self.thumbnail_jobs:
+            self.finish_thumbnail(self.thumbnail_jobs.popleft())
+
+    def wait(self, job):
+        # returns True if the job succeeded; blocks until the job is done.
+        item, future = job
+        (output, success), duration = future.result()
+        self.profiler.add(item.action, duration, item.size)
+        if not success:
+            if output:
+                print("failure at: %s (%s)" % (item.source, output.strip()))
+            else:
+                print("failure at: %s" % item.source)
+            return False
+
+        if self.args.verbose:
+            if output:
+                print(output.rstrip())
+            print(item.action.capitalize() + " \n\t-src:" + item.source + " \n\t-dest: " + item.destination)
+        self.engine.count(item.size)
+        self.profiler.call('record', self.record, item)
+        if self.thumbnails is not None:
+            from py_image_modifier.profiling import timed_call
+            self.thumbnail_jobs.append(self.engine.submit(timed_call, self.thumbnails.add, item.destination))
+            while len(self.thumbnail_jobs) >= self.engine.depth:
+                self.finish_thumbnail(self.thumbnail_jobs.popleft())
+        return True
+
+    def finish_thumbnail(self, future):
+        (path, error), duration = future.result()
+        self.profiler.add('thumbnail', duration)
+        if error is not None:
+            print("thumbnail failure: %s" % error)
+        elif self.args.verbose:
+            print("thumbnail: %s" % path)
+
+    def record(self, item):
+        # remembers a finished job for --resume, --index, --skip_duplicates and --skip_similar
+        # the source is not accessed here, it is gone after a move
+        self.journal.add(item.source, item.destination)
+        if item.key is None:
+            return
+        if self.args.index:
+            self.index.set_destination(item.key, item.destination)
+        if self.finder is not None:
+            self.finder.set_destination(item.key, item.destination)
+        if self.similar is not None:
+            self.similar.set_destination(item.key, item.destination)
+
+    def open(self):
+        from py_image_modifier.index import MetadataIndex
+        from py_image_modifier.dedup import DuplicateFinder
+        from py_image_modifier.discovery import parse_extensions
+        from py_image_modifier.journal import RunJournal, SHARD_NAME
+        from py_image_modifier.io_engine import IoEngine
+        from py_image_modifier.naming import NameAllocator
+        from py_image_modifier.thumbnails import ThumbnailCache, THUMBNAIL_DIR
+
+        args = self.args
+        if args.output_dir == "":
+            args.output_dir = args.input_dir
+        self.output_dir_root = os.path.abspath(args.output_dir)
+        if not os.path.exists(self.output_dir_root) and not args.dry_run:
+            os.makedirs(self.output_dir_root)
+            print("directory created: %s" % self.output_dir_root)
+
+        # the index caches the content and perceptual hashes as well:
+        if args.index or args.skip_duplicates or args.skip_similar or args.similar_report:
+            self.index = MetadataIndex.in_dir(self.output_dir_root, args.dry_run,
+                                              SHARD_NAME % self.shard if self.shard else None)
+        if args.skip_duplicates:
+            self.finder = DuplicateFinder(self.index)
+            if self.dedup_output_dir:
+                self.finder.add_existing_dir(self.output_dir_root, parse_extensions(args.ext))
+        if args.skip_similar or args.similar_report:
+            from py_image_modifier.similar import SimilarFinder
+            self.similar = SimilarFinder(args.similar_hash, args.similar_distance, args.skip_similar, self.index)
+        self.journal = RunJournal.in_dir(self.output_dir_root, self.tool, args.resume, args.dry_run, args.watch,
+                                         self.shard)
+        self.engine = IoEngine(args.io_depth)
+        # destination names of jobs that are still running are reserved, since their files do not exist yet; the
+        # shards of a sharded run also claim them on disk:
+        self.allocator = NameAllocator(claim=self.shard is not None and not args.dry_run)
+        if args.thumbnails and not args.dry_run:
+            thumbnail_dir = args.thumbnail_dir or os.path.join(self.output_dir_root, THUMBNAIL_DIR)
+            self.thumbnails = ThumbnailCache(thumbnail_dir, args.thumbnail_size, args.thumbnail_cache_mb * 1024 * 1024)
+
+    def close(self):
+        self.engine.close()
+        self.journal.close()
+        if self.index is not None:
+            self.index.close()
+
+    def finish(self, job, pbar):
+        if self.wait(job):
+            self.total_cnt += 1
+        else:
+            self.total_error += 1
+        pbar.update(1)
+
+    def show(self, plan):
+        # --dry_run: the planned jobs are only printed
+        for item in plan:
+            if item.is_job():
+                self.total_cnt += 1
+                if not self.args.plan:
+                    print(item.action.capitalize() + " \n\t-src:" + item.source + " \n\t-dest: " + item.destination)
+
+    def process(self, files, pbar, plan_writer=None):
+        # plans and executes the files in batches of --batch_size, so that only one batch is held in memory
+        files = iter(files)
+        while True:
+            batch = itertools.islice(files, self.args.batch_size) if self.args.batch_size > 0 else files
+            plan = self.plan(batch, pbar)
+            if not plan:
+                break
+            if plan_writer is not None:
+                plan_writer.write(plan)
+            if self.args.dry_run:
+                self.show(plan)
+            else:
+                self.execute(plan, pbar)
+                # the names of the batch are taken on disk now:
+                self.allocator.clear()
+
+    def watch(self, watcher, pbar):
+        # processes new files until the process gets interrupted (Ctrl-C) or terminated
+        from py_image_modifier.watch import watch_files
+        from py_image_modifier.discovery import select_shard
+
+        try:
+            for files in watch_files(watcher, self.args.settle):
+                if self.shard is not None:
+                    files = list(select_shard(files, self.input_root, self.shard))
+                self.process(files, pbar)
+                if self.index is not None:
+                    self.index.commit()
+        except KeyboardInterrupt:
+            pass
+
+    def run(self):
+        import signal
+        from tqdm import tqdm
+        from py_image_modifier.discovery import parse_extensions, scan_files, prefetch, parse_shard, select_shard
+        from py_image_modifier.watch import make_watcher
+        from py_image_modifier.plan import PlanWriter
+
+        args = self.args
+        if args.input_dir == "":
+            print('no input_dir specified!')
+            exit_failure()
+        path = os.path.abspath(args.input_dir)
+        if not os.path.isdir(path):
+            print("is not a directory %s" % path)
+            exit_failure()
+        self.input_root = path
+        if args.shard:
+            try:
+                self.shard = parse_shard(args.shard)
+            except ValueError:
+                print("invalid --shard %s, expected i/N with 1 <= i <= N" % args.shard)
+                exit_failure()
+        # the output_dir defaults to the input_dir:
+        output_dir = os.path.abspath(args.output_dir or args.input_dir)
+        output_in_input = output_dir == path or output_dir.startswith(os.path.join(path, ''))
+        watcher = None
+        if args.watch and args.dry_run:
+            print("--watch cannot be combined with --dry_run")
+            exit_failure()
+        if args.watch:
+            # the results would be reported as new files again:
+            if output_in_input:
+                print("--watch needs an output_dir outside of the input_dir")
+                exit_failure()
+            # stop like on Ctrl-C:
+            signal.signal(signal.SIGTERM, signal.default_int_handler)
+            # started before the scan, files that appear during the first pass are reported by the watcher
+            watcher = make_watcher(path, parse_extensions(args.ext), not (args.no_recursive), args.poll_interval,
+                                   args.verbose)
+        # the files are processed while the scan continues in the background:
+        files = scan_files(path, parse_extensions(args.ext), not (args.no_recursive), args.verbose)
+        if self.shard is not None:
+            files = select_shard(files, path, self.shard)
+        files = prefetch(self.profiler.iterate('scan', files))
+        if output_in_input:
+            # the scan would find the results of the first batches: take the complete listing before writing
+            files = list(files)
+
+        profile = None
+        if args.cprofile:
+            import cProfile
+            profile = cProfile.Profile()
+            profile.enable()
+
+        self.open()
+        self.start()
+        plan_writer = PlanWriter(args.plan) if args.plan else None
+        try:
+            with tqdm(unit=self.unit) as pbar:
+                self.process(files, pbar, plan_writer)
+                if plan_writer is not None:
+                    plan_writer.close()
+                    plan_writer = None
+                    print("plan written: %s" % args.plan)
+                if watcher is not None:
+                    self.watch(watcher, pbar)
+        finally:
+            if plan_writer is not None:
+                plan_writer.close()
+            if watcher is not None:
+                watcher.close()
+            self.stop()
+            self.close()
+            if profile is not None:
+                profile.disable()
+
+        if args.dry_run:
+            print("total planned files: %s" % self.total_cnt)
+        else:
+            print("total copied files: %s" % self.total_cnt)
+        print("total skipped files: %s" % self.total_skipped)
+        print("total error files: %s" % self.total_error)
+        if not args.dry_run:
+            print(self.engine.get_throughput_str())
+        if self.shard is not None and not args.dry_run:
+            print("shard %d/%d done, merge the results once all shards are done: py_image_modifier merge "
+                  "--output_dir %s" % (self.shard + (self.output_dir_root,)))
+        if args.profile:
+            print(self.profiler.get_report())
+        if args.similar_report:
+            from py_image_modifier.similar import write_groups
+            groups = self.similar.get_groups()
+            write_groups(groups, args.similar_report)
+            print("near-duplicate groups written: %s (%d groups)" % (args.similar_report, len(groups)))
+        if args.metrics:
+            self.profiler.write_metrics(args.metrics, self.tool)
+            print("metrics written: %s" % args.metrics)
+        if profile is not None:
+            import pstats
+            profile.dump_stats(args.cprofile)
+            pstats.Stats(profile).sort_stats('cumulative').print_stats(20)
+            print("cProfile stats written: %s" % args.cprofile)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# Software License Agreement (GNU GPLv3  License)
+#
+# Copyright (c) 2022, Roland Jung (rolandjung0@gmail.com)
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# The plan of a run: one entry per input file with its destination, or the reason why it is skipped. The whole plan is
+# computed before any file is written (per batch of --batch_size files); it can be reviewed with --dry_run and is saved
+# as JSON or CSV with --plan.
+
+import os
+
+PLAN_FIELDS = ['action', 'source', 'destination', 'reason', 'datetime', 'datetime_source', 'size']
+SKIP = 'skip'
+ERROR = 'error'
+
+
+class PlanEntry(object):
+    __slots__ = ('action', 'source', 'destination', 'reason', 'datetime', 'datetime_source', 'size', 'inode', 'key')
+
+    def __init__(self, source, key=None, size=0, inode=0):
+        self.action = None  # the transfer mode/'convert', SKIP or ERROR
+        self.source = source
+        self.destination = None  # the existing file for skipped files
+        self.reason = None
+        self.datetime = None
+        self.datetime_source = None
+        self.size = size
+        self.inode = inode
+        self.key = key
+
+    def is_job(self):
+        return self.action not in (SKIP, ERROR)
+
+    def to_row(self):
+        row = dict((field, getattr(self, field)) for field in PLAN_FIELDS)
+        if self.datetime is not None:
+            row['datetime'] = self.datetime.strftime('%Y-%m-%d %H:%M:%S')
+        return row
+
+
+class PlanWriter(object):
+    """
+    Writes the plan of a run batch by batch: as CSV for a .csv file, else as JSON list.
+    """
+    def __init__(self, fn):
+        self.fn = fn
+        self.csv = fn.lower().endswith('.csv')
+        self.num_entries = 0
+        if self.csv:
+            import csv
+            self.file = open(fn, 'w', newline='')
+            self.writer = csv.DictWriter(self.file, fieldnames=PLAN_FIELDS)
+            self.writer.writeheader()
+        else:
+            self.file = open(fn, 'w')
+            self.file.write('[')
+
+    def write(self, plan):
+        import json
+        for entry in plan:
+            if self.csv:
+                self.writer.writerow(entry.to_row())
+            else:
+                self.file.write((',\n ' if self.num_entries else '\n ') + json.dumps(entry.to_row()))
+            self.num_entries += 1
+
+    def close(self):
+        if not self.csv:
+            self.file.write('\n]\n')
+        self.file.close()
+
+
+def get_directories(jobs):
+    # the destination folders, each once and parents first
+    return sorted(set(os.path.dirname(entry.destination) for entry in jobs))
+
+
+def sort_for_io(jobs):
+    # source folder by folder, in inode order within a folder: close to the on-disk order of the files
+    return sorted(jobs, key=lambda entry: (os.path.dirname(entry.source), entry.inode, entry.source))
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# Software License Agreement (GNU GPLv3  License)
+#
+# Copyright (c) 2022, Roland Jung (rolandjung0@gmail.com)
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Timing of the pipeline stages (scan, metadata, dedup, naming, mkdir, copy/convert, record). The latencies are only
+# kept with --profile/--metrics; the report shows p50/p95/max, counts and bytes per stage and the metrics are written
+# as JSON or as Prometheus textfile (.prom) for the node_exporter textfile collector.
+
+import os
+import time
+import threading
+from array import array
+
+from py_image_modifier.journal import get_temp_filename
+
+METRIC_PREFIX = 'py_image_modifier'
+QUANTILES = [0.5, 0.95]
+
+
+def timed_call(func, *args):
+    # returns (func(*args), duration); module level, so that it can be sent to worker processes as well
+    t_start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - t_start
+
+
+def get_quantile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+class StageStats(object):
+    __slots__ = ('latencies', 'num_bytes')
+
+    def __init__(self):
+        self.latencies = array('d')
+        self.num_bytes = 0
+
+    def get_summary(self):
+        values = sorted(self.latencies)
+        summary = {'count': len(values), 'total': sum(values), 'max': values[-1] if values else 0.0,
+                   'bytes': self.num_bytes}
+        for q in QUANTILES:
+            summary['p%d' % round(q * 100)] = get_quantile(values, q)
+        return summary
+
+
+class Profiler(object):
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.stages = {}  # name -> StageStats, in order of appearance
+
+    def add(self, stage, duration, num_bytes=0):
+        if not self.enabled:
+            return
+        with self.lock:
+            stats = self.stages.get(stage)
+            if stats is None:
+                stats = self.stages[stage] = StageStats()
+            stats.latencies.append(duration)
+            stats.num_bytes += num_bytes
+
+    def call(self, stage, func, *args):
+        # func(*args) timed as stage
+        if not self.enabled:
+            return func(*args)
+        result, duration = timed_call(func, *args)
+        self.add(stage, duration)
+        return result
+
+    def iterate(self, stage, iterable):
+        # yields the items of iterable, the time to produce every item is taken as stage
+        if not self.enabled:
+            yield from iterable
+            return
+        it = iter(iterable)
+        while True:
+            t_start = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            self.add(stage, time.perf_counter() - t_start)
+            yield item
+
+    def get_summaries(self):
+        with self.lock:
+            return [(stage, stats.get_summary()) for stage, stats in self.stages.items()]
+
+    def get_report(self):
+        lines = ["%-12s %8s %10s %10s %10s %10s %10s" % ('stage', 'count', 'p50 [ms]', 'p95 [ms]', 'max [ms]',
+                                                         'total [s]', 'MB')]
+        for stage, s in self.get_summaries():
+            lines.append("%-12s %8d %10.3f %10.3f %10.3f %10.3f %10.1f" % (
+                stage, s['count'], s['p50'] * 1e3, s['p95'] * 1e3, s['max'] * 1e3, s['total'], s['bytes'] / 1e6))
+        return '\n'.join(lines)
+
+    def get_prometheus_text(self, tool):
+        name = METRIC_PREFIX + '_stage_seconds'
+        lines = ['# HELP %s latency of the pipeline stages' % name, '# TYPE %s summary' % name]
+        summaries = self.get_summaries()
+        for stage, s in summaries:
+            labels = 'tool="%s",stage="%s"' % (tool, stage)
+            for q in QUANTILES:
+                lines.append('%s{%s,quantile="%s"} %.9f' % (name, labels, q, s['p%d' % round(q * 100)]))
+            lines.append('%s_sum{%s} %.9f' % (name, labels, s['total']))
+            lines.append('%s_count{%s} %d' % (name, labels, s['count']))
+        for suffix, key, kind, help in [('_max', 'max', 'gauge', 'maximal latency of the pipeline stages'),
+                                        ('_bytes_total', 'bytes', 'counter', 'bytes processed by the pipeline stages')]:
+            metric = METRIC_PREFIX + '_stage' + suffix
+            lines.append('# HELP %s %s' % (metric, help))
+            lines.append('# TYPE %s %s' % (metric, kind))
+            for stage, s in summaries:
+                lines.append('%s{tool="%s",stage="%s"} %s' % (metric, tool, stage, s[key]))
+        return '\n'.join(lines) + '\n'
+
+    def write_metrics(self, fn, tool):
+        # .prom: Prometheus textfile, else JSON; replaced atomically, the collector may read it at any time
+        if fn.endswith('.prom'):
+            text = self.get_prometheus_text(tool)
+        else:
+            import json
+            text = json.dumps({'tool': tool, 'stages': dict(self.get_summaries())}, indent=1) + '\n'
+        tmp_file = get_temp_filename(fn)
+        with open(tmp_file, 'w') as f:
+            f.write(text)
+        os.replace(tmp_file, fn)
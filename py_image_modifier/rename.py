@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# Software License Agreement (GNU GPLv3  License)
+#
+# Copyright (c) 2022, Roland Jung (rolandjung0@gmail.com)
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# The pipeline of the rename subcommands: copies/moves/links the files named by their (shifted) timestamp.
+
+import os
+from datetime import timedelta
+
+from py_image_modifier.common import add_common_arguments, MODES
+from py_image_modifier.pipeline import Pipeline
+
+
+class RenamePipeline(Pipeline):
+    dedup_output_dir = True
+
+    def adjust_datetime(self, datetime_object, device):
+        return datetime_object + timedelta(hours=self.args.add_hours, minutes=self.args.add_minutes,
+                                           seconds=self.args.add_seconds)
+
+    def get_action(self):
+        return self.args.mode
+
+    def submit(self, item, datetime_object=None):
+        # datetime_object: written into the EXIF dates of the destination, see transfer_file()
+        from py_image_modifier.profiling import timed_call
+        return self.engine.submit(timed_call, self.engine.transfer, item.source, item.destination, self.args.mode,
+                                  datetime_object)
+
+
+def get_file_ext(file_orig):
+    # keep the extension of the original file (--ext may list several):
+    return os.path.splitext(file_orig)[1]
+
+
+def add_arguments(parser, ext):
+    add_common_arguments(parser, 'copied')
+    parser.add_argument('--prefix', help='prefix to the final image name: <prefix><data>.<ext>', default='IMG')
+    parser.add_argument('--ext', help='file extension(s), case-insensitive, e.g. jpg,jpeg', default=ext)
+    parser.add_argument('--add_seconds', help='adds <N> seconds to the timestamps', type=int, default=0)
+    parser.add_argument('--add_minutes', help='adds <N> minutes to the timestamps', type=int, default=0)
+    parser.add_argument('--add_hours', help='adds <N> hours to the timestamps', type=int, default=0)
+    parser.add_argument('--skip_duplicates', action='store_true',
+                        help='skip files with identical content (in the input_dir or output_dir)', default=False)
+    parser.add_argument('--mode', help='how files get into the output_dir (copy)', default='copy', choices=MODES)
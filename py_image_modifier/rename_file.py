@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# Software License Agreement (GNU GPLv3  License)
+#
+# Copyright (c) 2019, Roland Jung (rolandjung0@gmail.com)
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# rename-file subcommand: renames files by their modification time.
+
+from py_image_modifier.common import exit_success
+from py_image_modifier.rename import RenamePipeline, add_arguments as add_rename_arguments, get_file_ext
+
+HELP = 'renames files by their modification time'
+DESCRIPTION = 'Renaming all files from the input_dir by file creation data and stored in output_dir:\n usage: --input_dir ../test/rename_in --output_dir ../test/rename_out --ext JPG --prefix bla --verbose --add_hours 123'
+
+
+def make_name(prefix, datetime_str, file_ext, number):
+    # <prefix>_<timestamp><ext> or <prefix>_<timestamp>_<n><ext>
+    if number == 0:
+        return prefix + "_" + datetime_str + file_ext
+    return prefix + "_" + datetime_str + "_" + str(number) + file_ext
+
+
+class RenameFilePipeline(RenamePipeline):
+    tool = 'rename_file'
+
+    def make_name(self, file_orig, datetime_str, number):
+        return make_name(self.args.prefix, datetime_str, get_file_ext(file_orig), number)
+
+
+def add_arguments(parser):
+    add_rename_arguments(parser, 'jpg')
+
+
+def run(args):
+    RenameFilePipeline(args).run()
+    exit_success()
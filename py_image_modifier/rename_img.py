@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# Software License Agreement (GNU GPLv3  License)
+#
+# Copyright (c) 2019, Roland Jung (rolandjung0@gmail.com)
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# rename-img subcommand: renames images by the timestamp of their EXIF data (or modification time).
+
+import os
+from datetime import datetime
+
+from py_image_modifier.common import exit_success, exit_failure, EXIF_MODES
+from py_image_modifier.exif import read_exif_datetime, read_exif_device, TAG_DATETIME, TAG_EXIF_IFD, TAG_DATETIME_ORIGINAL
+from py_image_modifier.rename import RenamePipeline, add_arguments as add_rename_arguments, get_file_ext
+
+HELP = 'renames images by their EXIF timestamp'
+DESCRIPTION = 'Renaming all images from the input_dir by file timestamp and stored in output_dir:\n usage: --input_dir ../test/rename_in --output_dir ../test/rename_out --ext JPG --prefix bla --verbose --add_hours 123'
+
+
+def get_exif_datetime_str(fn):
+    # returns (DateTimeOriginal or DateTime or None, error); only the date tags are read, no tag dictionary is built
+    from PIL import Image
+
+    try:
+        with Image.open(fn) as img:
+            exif = img.getexif()
+            return exif.get_ifd(TAG_EXIF_IFD).get(TAG_DATETIME_ORIGINAL) or exif.get(TAG_DATETIME), False
+    except:
+        return None, True
+
+
+def get_datatime_and_source_from_image(fn):
+    # returns (datetime_object, source) with source 'exif' or 'mtime'; (None, None) on failure
+    # fast path: read the date tag from the JPEG/HEIC header only
+    datetime_str, parsed = read_exif_datetime(fn)
+    if not parsed:
+        datetime_str, error = get_exif_datetime_str(fn)
+        if error:
+            return None, None
+
+    if datetime_str:
+        try:
+            datetime_object = datetime.strptime(datetime_str, '%Y:%m:%d %H:%M:%S')
+            return datetime_object, 'exif'
+        except:
+            return None, None
+
+    try:  # try the modification timestamp:
+        datetime_object = datetime.fromtimestamp(os.path.getmtime(fn))
+        # print("last modified: %s" % time.ctime(datetime_object))
+        return datetime_object, 'mtime'
+    except:
+        return None, None
+
+
+def make_name(prefix, datetime_str, file_ext, number):
+    # <prefix>_<timestamp><ext> or <prefix>_<n>_<timestamp><ext>
+    if number == 0:
+        return prefix + "_" + datetime_str + file_ext
+    return prefix + "_" + str(number) + "_" + datetime_str + file_ext
+
+
+class RenameImgPipeline(RenamePipeline):
+    tool = 'rename_img'
+    unit = 'imgs'
+
+    def __init__(self, args):
+        RenamePipeline.__init__(self, args)
+        self.offsets = None  # clock.OffsetTable
+        if args.write_exif and args.mode not in EXIF_MODES:
+            print("--write_exif needs --mode %s" % ', '.join(EXIF_MODES))
+            exit_failure()
+        if args.offsets and args.estimate_offsets:
+            print("use either --offsets or --estimate_offsets")
+            exit_failure()
+        if args.offsets:
+            from py_image_modifier.clock import OffsetTable
+            try:
+                self.offsets = OffsetTable.load(args.offsets)
+            except (OSError, ValueError) as e:
+                print("invalid offset table %s: %s" % (args.offsets, e))
+                exit_failure()
+
+    def adjust_datetime(self, datetime_object, device):
+        adjusted = RenamePipeline.adjust_datetime(self, datetime_object, device)
+        if self.offsets is not None:
+            # the time ranges of the table refer to the uncorrected clock
+            adjusted += self.offsets.get_offset(device, datetime_object)
+        return adjusted
+
+    def start(self):
+        if self.args.estimate_offsets:
+            self.offsets = self.estimate_offsets()
+
+    def read_shot(self, dir_entry):
+        # runs in the I/O threads: returns (device, EXIF timestamp) or (None, None)
+        device = self.get_device(dir_entry)
+        if device is None:
+            return None, None
+        entry = None
+        if self.args.index:
+            key, entry = self.index.lookup(dir_entry.path, dir_entry)
+        if entry is not None:
+            datetime_object, source = entry.datetime, entry.source
+        else:
+            datetime_object, source = self.get_datetime(dir_entry)
+        return device, datetime_object if source == 'exif' else None
+
+    def estimate_offsets(self):
+        # reads the camera and timestamp of all input files and estimates the clock offsets of the cameras
+        from py_image_modifier.clock import estimate_offsets, make_table, write_estimates, format_device
+        from py_image_modifier.discovery import parse_extensions, scan_files
+
+        args = self.args
+        files = scan_files(os.path.abspath(args.input_dir), parse_extensions(args.ext), not (args.no_recursive))
+        read_shot = lambda dir_entry: self.profiler.call('clock', self.read_shot, dir_entry)
+        shots = {}
+        for dir_entry, (device, datetime_object) in self.engine.map_ordered(read_shot, files):
+            if datetime_object is not None:
+                shots.setdefault(device, []).append(datetime_object)
+
+        estimates = estimate_offsets(shots, args.clock_reference)
+        for device, offset, num_shots, num_matched in estimates:
+            if offset is None:
+                print("clock offset of %s: no overlapping shots (%d shots)" % (format_device(device), num_shots))
+            else:
+                print("clock offset of %s: %+ds (%d of %d shots overlap)" % (format_device(device), offset,
+                                                                              num_matched, num_shots))
+        write_estimates(args.estimate_offsets, shots, estimates)
+        print("clock offsets written: %s" % args.estimate_offsets)
+        return make_table(shots, estimates)
+
+    def get_datetime(self, dir_entry):
+        return get_datatime_and_source_from_image(dir_entry.path)
+
+    def get_device(self, dir_entry):
+        if self.offsets is None and not self.args.estimate_offsets:
+            return None
+        return read_exif_device(dir_entry.path)
+
+    def make_name(self, file_orig, datetime_str, number):
+        return make_name(self.args.prefix, datetime_str, get_file_ext(file_orig), number)
+
+    def submit(self, item):
+        # only timestamps read from the EXIF data are written back:
+        if self.args.write_exif and item.datetime_source == 'exif':
+            return RenamePipeline.submit(self, item, item.datetime)
+        return RenamePipeline.submit(self, item)
+
+
+def add_arguments(parser):
+    add_rename_arguments(parser, 'jpg')
+    parser.add_argument('--offsets', help='CSV table of clock offsets per camera: make,model,serial,start,end,offset',
+                        default=None)
+    parser.add_argument('--estimate_offsets',
+                        help='estimate the clock offsets of the cameras from overlapping shots, save them as CSV '
+                             'table and apply them', default=None)
+    parser.add_argument('--clock_reference',
+                        help='--estimate_offsets: camera with the correct clock, e.g. iPhone (most images)',
+                        default=None)
+    parser.add_argument('--write_exif', action='store_true',
+                        help='write the corrected timestamp into the EXIF dates of the copied images (in place, '
+                             'without re-encoding)', default=False)
+
+
+def run(args):
+    RenameImgPipeline(args).run()
+    exit_success()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+# Software License Agreement (GNU GPLv3  License)
+#
+# Copyright (c) 2022, Roland Jung (rolandjung0@gmail.com)
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Perceptual near-duplicate detection: burst shots, re-encoded or resized copies and the JPEG of a converted HEIC
+# differ in their bytes, but not in their perceptual hash. The 64 bit hashes (dHash or pHash) are computed from a
+# downscaled decode (JPEG draft mode) and compared by their Hamming distance. Multi-index hashing limits every lookup
+# to a small part of the known hashes, so grouping 100k images does not compare all pairs. NumPy is used if it is installed.
+
+import os
+import math
+
+from py_image_modifier.common import HASH_DISTANCE
+from py_image_modifier.index import get_file_key
+
+HASH_SIZE = 8
+DCT_SIZE = 32  # pHash: the DCT of a 32x32 image, of which the lowest 8x8 frequencies are kept
+DRAFT_SIZE = 128
+NUM_CHUNKS = 4  # multi-index hashing: 4 tables of 16 bit chunks
+CHUNK_BITS = HASH_SIZE * HASH_SIZE // NUM_CHUNKS
+HASH_METHODS = ['dhash', 'phash']
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# DCT-II basis of the lowest HASH_SIZE frequencies, scaling does not matter for the median comparison
+DCT_MATRIX = [[math.cos(math.pi * (2 * i + 1) * k / (2.0 * DCT_SIZE)) for i in range(DCT_SIZE)]
+              for k in range(HASH_SIZE)]
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+def bits_to_int(bits):
+    value = 0
+    for bit in bits:
+        value = (value << 1) | bool(bit)
+    return value
+
+
+def load_gray(fn, size):
+    # returns the image fn as grayscale image of the given size, rotated upright
+    from PIL import Image, ImageOps
+    try:
+        import pillow_heif
+        pillow_heif.register_heif_opener()
+    except ImportError:
+        pass
+
+    with Image.open(fn) as img:
+        img.draft('L', (DRAFT_SIZE, DRAFT_SIZE))
+        img = ImageOps.exif_transpose(img)
+        return img.convert('L').resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+
+def dhash(img):
+    # difference hash: is a pixel brighter than its left neighbour, img is (HASH_SIZE + 1) x HASH_SIZE
+    if numpy is not None:
+        pixels = numpy.asarray(img, dtype=numpy.int16)
+        return bits_to_int((pixels[:, 1:] > pixels[:, :-1]).ravel().tolist())
+    pixels = list(img.getdata())
+    width = HASH_SIZE + 1
+    return bits_to_int(pixels[row * width + col + 1] > pixels[row * width + col]
+                       for row in range(HASH_SIZE) for col in range(HASH_SIZE))
+
+
+def phash(img):
+    # DCT hash: is a low frequency above the median of the low frequencies, img is DCT_SIZE x DCT_SIZE
+    if numpy is not None:
+        basis = numpy.array(DCT_MATRIX)
+        coeffs = (basis.dot(numpy.asarray(img, dtype=numpy.float64)).dot(basis.T)).ravel()
+        return bits_to_int((coeffs > numpy.median(coeffs)).tolist())
+    pixels = list(img.getdata())
+    rows = [pixels[i:i + DCT_SIZE] for i in range(0, DCT_SIZE * DCT_SIZE, DCT_SIZE)]
+    # rows first, then columns:
+    tmp = [[sum(b * p for b, p in zip(basis, row)) for basis in DCT_MATRIX] for row in rows]
+    coeffs = [sum(basis[j] * tmp[j][l] for j in range(DCT_SIZE))
+              for basis in DCT_MATRIX for l in range(HASH_SIZE)]
+    ordered = sorted(coeffs)
+    median = (ordered[len(ordered) // 2 - 1] + ordered[len(ordered) // 2]) / 2.0
+    return bits_to_int(c > median for c in coeffs)
+
+
+def image_hash(fn, method=HASH_METHODS[0]):
+    # returns the 64 bit perceptual hash of the image fn, raises OSError if it cannot be decoded
+    if method == 'phash':
+        return phash(load_gray(fn, (DCT_SIZE, DCT_SIZE)))
+    return dhash(load_gray(fn, (HASH_SIZE + 1, HASH_SIZE)))
+
+
+class MultiIndex(object):
+    """
+    Multi-index hashing: the 64 bit hashes are split into NUM_CHUNKS chunks of 16 bits with a hash table each. Two
+    hashes within max_distance differ in at most max_distance // NUM_CHUNKS bits of at least one chunk (pigeonhole
+    principle), so a search only looks up the chunk values within that radius and checks the few candidates found.
+    """
+    def __init__(self, max_distance=HASH_DISTANCE):
+        self.max_distance = max_distance
+        self.tables = [{} for _ in range(NUM_CHUNKS)]  # chunk value -> [position in hashes]
+        self.hashes = []  # [(hash, value)]
+        radius = max_distance // NUM_CHUNKS
+        self.flips = [flip for flip in range(1 << CHUNK_BITS) if bin(flip).count('1') <= radius]
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def add(self, h, value):
+        for table, chunk in zip(self.tables, self._chunks(h)):
+            table.setdefault(chunk, []).append(len(self.hashes))
+        self.hashes.append((h, value))
+
+    def search(self, h):
+        # returns [(distance, value)] of all hashes within max_distance, the closest first
+        candidates = set()
+        for table, chunk in zip(self.tables, self._chunks(h)):
+            for flip in self.flips:
+                candidates.update(table.get(chunk ^ flip, ()))
+        found = []
+        for position in sorted(candidates):
+            other, value = self.hashes[position]
+            distance = hamming_distance(h, other)
+            if distance <= self.max_distance:
+                found.append((distance, value))
+        found.sort(key=lambda match: match[0])
+        return found
+
+    @staticmethod
+    def _chunks(h):
+        mask = (1 << CHUNK_BITS) - 1
+        return [(h >> (i * CHUNK_BITS)) & mask for i in range(NUM_CHUNKS)]
+
+
+class SimilarFinder(object):
+    """
+    Finds near-duplicates among the processed images and the images kept by previous runs, and groups them.
+    With skip set, near-duplicates are not added to the index: an image is compared with the kept images only, so that
+    a slow drift through a long burst does not skip the whole burst.
+    """
+    def __init__(self, method=HASH_METHODS[0], max_distance=HASH_DISTANCE, skip=False, index=None):
+        self.method = method
+        self.max_distance = max_distance
+        self.skip = skip
+        self.index = index
+        self.hashes = MultiIndex(max_distance)
+        self.parents = {}  # union-find of the groups: path -> parent path
+        if index is not None:
+            for h, destination in index.get_transferred_phashes(method):
+                if destination not in self.parents and os.path.exists(destination):
+                    self.parents[destination] = destination
+                    self.hashes.add(int(h, 16), destination)
+
+    def hash(self, fn, dir_entry=None):
+        # returns the perceptual hash of fn or None; thread safe, cached in the index
+        try:
+            key = get_file_key(fn, dir_entry)
+        except OSError:
+            return None
+        if self.index is not None:
+            h = self.index.get_phash(key, self.method)
+            if h is not None:
+                return int(h, 16)
+        try:
+            h = image_hash(fn, self.method)
+        except (OSError, ValueError):
+            return None
+        if self.index is not None:
+            self.index.put_phash(key, self.method, '%016x' % h)
+        return h
+
+    def add(self, fn, h):
+        # returns (closest image, distance) of the known images within max_distance or (None, None); fn is known
+        # afterwards
+        matches = self.hashes.search(h)
+        self.parents.setdefault(fn, fn)
+        for distance, other in matches:
+            self._union(other, fn)
+        if matches and self.skip:
+            return matches[0][1], matches[0][0]
+        self.hashes.add(h, fn)
+        if matches:
+            return matches[0][1], matches[0][0]
+        return None, None
+
+    def set_destination(self, key, destination):
+        # remembers the hash of a transferred image for the next runs; key was taken before the transfer
+        if self.index is not None:
+            self.index.set_phash_destination(key, self.method, destination)
+
+    def get_groups(self):
+        # returns the lists of images that are near-duplicates of each other, in the order they were added
+        groups = {}
+        for fn in self.parents:
+            groups.setdefault(self._find(fn), []).append(fn)
+        return [group for group in groups.values() if len(group) > 1]
+
+    def _find(self, fn):
+        root = fn
+        while self.parents[root] != root:
+            root = self.parents[root]
+        while self.parents[fn] != root:  # path compression
+            self.parents[fn], fn = root, self.parents[fn]
+        return root
+
+    def _union(self, a, b):
+        root_a, root_b = self._find(a), self._find(b)
+        if root_a != root_b:
+            self.parents[root_b] = root_a
+
+
+def write_groups(groups, fn):
+    # writes the groups of near-duplicates as CSV (group, file) for a .csv file, else as JSON list of lists
+    if fn.lower().endswith('.csv'):
+        import csv
+        with open(fn, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['group', 'file'])
+            for number, group in enumerate(groups):
+                for path in group:
+                    writer.writerow([number, path])
+    else:
+        import json
+        with open(fn, 'w') as f:
+            json.dump(groups, f, indent=1)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# Software License Agreement (GNU GPLv3  License)
+#
+# Copyright (c) 2022, Roland Jung (rolandjung0@gmail.com)
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Thumbnail cache filled during the import: <cache>/<hash[:2]>/<hash>.jpg, addressed by the BLAKE2 hash of the image
+# content (see dedup.file_hash). The embedded EXIF thumbnail is used if there is one, otherwise the image is decoded
+# in JPEG draft mode at (a multiple of) the thumbnail size. The cache is kept below a size cap by removing the least
+# recently used thumbnails; a hit refreshes the modification time of the thumbnail.
+
+import os
+import threading
+
+from py_image_modifier.common import THUMBNAIL_SIZE, CACHE_SIZE_MB
+from py_image_modifier.dedup import file_hash
+from py_image_modifier.discovery import THUMBNAIL_DIR
+from py_image_modifier.exif import read_exif_thumbnail, TAG_ORIENTATION
+from py_image_modifier.journal import get_temp_filename, TEMP_PREFIX
+
+THUMBNAIL_QUALITY = 85
+# EXIF orientation -> PIL.Image.Transpose that turns the image upright
+ORIENTATION_TRANSPOSE = {2: 'FLIP_LEFT_RIGHT', 3: 'ROTATE_180', 4: 'FLIP_TOP_BOTTOM', 5: 'TRANSPOSE', 6: 'ROTATE_270',
+                         7: 'TRANSVERSE', 8: 'ROTATE_90'}
+
+
+def make_thumbnail(fn, size=THUMBNAIL_SIZE):
+    # returns the JPEG data of the thumbnail of fn (longest side <= size, rotated upright)
+    import io
+    from PIL import Image
+    try:
+        import pillow_heif
+        pillow_heif.register_heif_opener()
+    except ImportError:
+        pass
+
+    data, orientation = read_exif_thumbnail(fn)
+    if data is not None:
+        with Image.open(io.BytesIO(data)) as img:  # only the header is read here
+            fits = max(img.size) <= size
+        if fits and orientation not in ORIENTATION_TRANSPOSE:
+            return data  # no decode at all
+        img = Image.open(io.BytesIO(data))
+    else:
+        img = Image.open(fn)
+        img.draft('RGB', (size, size))
+        # pillow_heif applies the orientation while decoding and resets the tag
+        orientation = img.getexif().get(TAG_ORIENTATION)
+    with img:
+        img.thumbnail((size, size), reducing_gap=2.0)
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        if orientation in ORIENTATION_TRANSPOSE:
+            # the thumbnail is written without EXIF, the orientation of the image is applied instead
+            img = img.transpose(getattr(Image.Transpose, ORIENTATION_TRANSPOSE[orientation]))
+        out = io.BytesIO()
+        img.save(out, 'JPEG', quality=THUMBNAIL_QUALITY)
+        return out.getvalue()
+
+
+class ThumbnailCache(object):
+    def __init__(self, dir, size=THUMBNAIL_SIZE, max_bytes=CACHE_SIZE_MB * 1024 * 1024):
+        self.dir = dir
+        self.size = size
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = {}  # path -> (last use, bytes)
+        self.num_bytes = 0
+        for root, dirs, files in os.walk(dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    if name.startswith(TEMP_PREFIX):
+                        os.remove(path)  # left behind by a killed run
+                        continue
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                self.entries[path] = (st.st_mtime, st.st_size)
+                self.num_bytes += st.st_size
+        self.evict()
+
+    def get_path(self, digest):
+        return os.path.join(self.dir, digest[:2], digest + '.jpg')
+
+    def add(self, fn):
+        # returns (path of the thumbnail, error); runs in the I/O threads
+        try:
+            path = self.get_path(file_hash(fn))
+            if path in self.entries:
+                os.utime(path)
+                with self.lock:
+                    self.entries[path] = (os.path.getmtime(path), self.entries[path][1])
+                return path, None
+
+            data = make_thumbnail(fn, self.size)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            file_tmp = get_temp_filename(path) + '.%d.%d' % (os.getpid(), threading.get_ident())
+            with open(file_tmp, 'wb') as f:
+                f.write(data)
+            os.replace(file_tmp, path)
+        except Exception as e:  # Pillow raises all kinds of errors for broken images
+            return None, str(e)
+
+        with self.lock:
+            if path not in self.entries:  # the same content can be added by two threads at once
+                self.num_bytes += len(data)
+            self.entries[path] = (os.path.getmtime(path), len(data))
+        if self.num_bytes > self.max_bytes:
+            self.evict()
+        return path, None
+
+    def evict(self):
+        # removes the least recently used thumbnails until the cache is at 90% of its cap
+        with self.lock:
+            if self.num_bytes <= self.max_bytes:
+                return
+            for path, (last_use, num_bytes) in sorted(self.entries.items(), key=lambda item: item[1][0]):
+                if self.num_bytes <= 0.9 * self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                del self.entries[path]
+                self.num_bytes -= num_bytes
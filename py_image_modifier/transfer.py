@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# Software License Agreement (GNU GPLv3  License)
+#
+# Copyright (c) 2022, Roland Jung (rolandjung0@gmail.com)
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# File transfer modes of the rename tools. Every mode creates the destination under a temporary name and renames it
+# into place, copies keep the permission bits and timestamps of the source. The EXIF dates of a copied/moved image can
+# be corrected on the temporary file, before it becomes visible.
+
+import os
+import stat
+import errno
+import shutil
+
+from py_image_modifier.common import EXIF_MODES
+from py_image_modifier.exif import write_exif_datetime
+from py_image_modifier.journal import get_temp_filename, MOVE_PREFIX
+
+FICLONE = 0x40049409  # linux/fs.h: _IOW(0x94, 9, int)
+CHUNK_SIZE = 8 * 1024 * 1024
+
+# errors of the zero-copy syscalls that mean "not supported here, use the next method":
+FALLBACK_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTTY, errno.EBADF,
+                   errno.EPERM}
+
+
+def _reflink(fd_src, fd_dst):
+    # returns True if the data was cloned (btrfs, XFS, ...)
+    try:
+        import fcntl
+        fcntl.ioctl(fd_dst, FICLONE, fd_src)
+    except (ImportError, OSError) as e:
+        if isinstance(e, OSError) and e.errno not in FALLBACK_ERRNOS:
+            raise
+        return False
+    return True
+
+
+def _copy_file_range(fd_src, fd_dst, size):
+    # returns True if the data was copied in the kernel
+    if not hasattr(os, 'copy_file_range'):
+        return False
+    copied = 0
+    try:
+        while copied < size:
+            n = os.copy_file_range(fd_src, fd_dst, min(CHUNK_SIZE, size - copied))
+            if n == 0:
+                break
+            copied += n
+    except OSError as e:
+        if copied > 0 or e.errno not in FALLBACK_ERRNOS:
+            raise
+        return False
+    return True
+
+
+def _sendfile(fd_src, fd_dst, size):
+    if not hasattr(os, 'sendfile'):
+        return False
+    copied = 0
+    try:
+        while copied < size:
+            n = os.sendfile(fd_dst, fd_src, copied, min(CHUNK_SIZE, size - copied))
+            if n == 0:
+                break
+            copied += n
+    except OSError as e:
+        if copied > 0 or e.errno not in FALLBACK_ERRNOS:
+            raise
+        return False
+    return True
+
+
+def copy_data(src, dst, reflink=False):
+    # copies the content and the metadata (mode, atime, mtime) of src to dst with the fastest available method
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        st = os.fstat(fsrc.fileno())
+        fd_src, fd_dst = fsrc.fileno(), fdst.fileno()
+        if not (reflink and _reflink(fd_src, fd_dst)) \
+                and not _copy_file_range(fd_src, fd_dst, st.st_size) \
+                and not _sendfile(fd_src, fd_dst, st.st_size):
+            shutil.copyfileobj(fsrc, fdst, CHUNK_SIZE)
+        fdst.flush()
+        os.chmod(fd_dst if os.chmod in os.supports_fd else dst, stat.S_IMODE(st.st_mode))
+        os.utime(fd_dst if os.utime in os.supports_fd else dst, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+
+def move_file(src, dst):
+    try:
+        os.rename(src, dst)  # same filesystem: no data is moved at all
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        copy_data(src, dst)
+        os.remove(src)
+
+
+def set_exif_datetime(fn, datetime_object):
+    # writes the EXIF dates of fn in place and keeps its timestamps; returns None or the reason why fn is unchanged
+    # (e.g. the EXIF data of PNG/WebP/TIFF or a HEIC file with the EXIF data in several extents)
+    st = os.stat(fn)
+    try:
+        changed = write_exif_datetime(fn, datetime_object)
+    except ValueError as e:
+        return str(e)
+    if changed:
+        os.utime(fn, ns=(st.st_atime_ns, st.st_mtime_ns))
+    return None
+
+
+def transfer_file(src, dst, mode='copy', datetime_object=None):
+    # transfers src to dst with one of MODES; dst never exists half-written. With datetime_object, the EXIF dates of
+    # dst are set to it (copy, move and reflink only, links share the data with src). Returns None or the reason why
+    # the EXIF dates were not written, dst is an unchanged copy then.
+    if datetime_object is not None and mode not in EXIF_MODES:
+        raise ValueError("the EXIF dates cannot be written with mode %s" % mode)
+    warning = None
+    if mode == 'move':
+        file_tmp = get_temp_filename(dst, MOVE_PREFIX)
+        move_file(src, file_tmp)
+        if datetime_object is not None:
+            try:
+                warning = set_exif_datetime(file_tmp, datetime_object)
+            except BaseException:
+                move_file(file_tmp, src)  # give the source back
+                raise
+        os.replace(file_tmp, dst)
+        return warning
+
+    file_tmp = get_temp_filename(dst)
+    try:
+        if mode == 'copy' or mode == 'reflink':
+            copy_data(src, file_tmp, reflink=(mode == 'reflink'))
+            if datetime_object is not None:
+                warning = set_exif_datetime(file_tmp, datetime_object)
+        elif mode == 'hardlink':
+            os.link(src, file_tmp)
+        elif mode == 'symlink':
+            os.symlink(os.path.abspath(src), file_tmp)
+        else:
+            raise ValueError("unknown transfer mode: %s" % mode)
+        os.replace(file_tmp, dst)
+    except BaseException:
+        if os.path.lexists(file_tmp):
+            os.remove(file_tmp)
+        raise
+    return warning
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# Software License Agreement (GNU GPLv3  License)
+#
+# Copyright (c) 2022, Roland Jung (rolandjung0@gmail.com)
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Watch mode: new files in the input_dir are reported with inotify (linux), other systems or a failing inotify fall
+# back to polling with os.scandir. Files are handed over once their size and modification time did not change for a
+# settle time, so that files which are still being copied into the folder are not processed half written.
+
+import os
+import time
+import errno
+import struct
+import select
+
+from py_image_modifier.common import SETTLE_TIME, POLL_INTERVAL
+from py_image_modifier.discovery import has_extension, scan_files, FileEntry
+from py_image_modifier.journal import TEMP_PREFIX
+
+# linux/inotify.h:
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+
+
+class InotifyWatcher(object):
+    def __init__(self, dir, exts, recursive=True):
+        import ctypes
+        self.dir = dir
+        self.exts = exts
+        self.recursive = recursive
+        self.libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, os.strerror(e))
+        self.dirs = {}  # watch descriptor -> directory
+        try:
+            self._add_tree(dir)
+        except OSError:
+            os.close(self.fd)
+            raise
+
+    def _add_dir(self, dir):
+        import ctypes
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dir), WATCH_MASK)
+        if wd < 0:
+            e = ctypes.get_errno()
+            if e in (errno.ENOENT, errno.ENOTDIR):
+                return  # removed in the meantime
+            raise OSError(e, os.strerror(e), dir)
+        self.dirs[wd] = dir
+
+    def _add_tree(self, dir):
+        self._add_dir(dir)
+        if self.recursive:
+            for root, sub_dirs, files in os.walk(dir):
+                for sub_dir in sub_dirs:
+                    self._add_dir(os.path.join(root, sub_dir))
+
+    def read(self, timeout=None):
+        # returns the paths of the files that were created or changed; waits at most timeout seconds for events
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        paths = []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # events were lost: report everything
+                paths.extend(entry.path for entry in scan_files(self.dir, self.exts, self.recursive))
+                continue
+            if mask & IN_IGNORED:
+                self.dirs.pop(wd, None)
+                continue
+            dir = self.dirs.get(wd)
+            if dir is None or not name:
+                continue
+            path = os.path.join(dir, name)
+            if mask & IN_ISDIR:
+                if self.recursive and mask & (IN_CREATE | IN_MOVED_TO):
+                    # files can be created before the watch of the new directory is in place:
+                    self._add_tree(path)
+                    paths.extend(entry.path for entry in scan_files(path, self.exts))
+            elif has_extension(name, self.exts) and not name.startswith(TEMP_PREFIX):
+                paths.append(path)
+        return paths
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher(object):
+    def __init__(self, dir, exts, recursive=True, interval=POLL_INTERVAL):
+        self.dir = dir
+        self.exts = exts
+        self.recursive = recursive
+        self.interval = interval
+        self.known = self._scan()
+        self.next_scan = time.monotonic() + interval
+
+    def _scan(self):
+        known = {}
+        for entry in scan_files(self.dir, self.exts, self.recursive):
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            known[entry.path] = (st.st_size, st.st_mtime_ns)
+        return known
+
+    def read(self, timeout=None):
+        delay = self.next_scan - time.monotonic()
+        if timeout is not None and timeout < delay:
+            time.sleep(max(timeout, 0))
+            return []
+        time.sleep(max(delay, 0))
+        known = self._scan()
+        self.next_scan = time.monotonic() + self.interval
+        paths = [path for path, state in known.items() if self.known.get(path) != state]
+        self.known = known
+        return paths
+
+    def close(self):
+        pass
+
+
+def make_watcher(dir, exts, recursive=True, interval=POLL_INTERVAL, verbose=False):
+    try:
+        watcher = InotifyWatcher(dir, exts, recursive)
+        if verbose:
+            print("watching with inotify: %s" % dir)
+        return watcher
+    except (OSError, AttributeError) as e:  # no linux or out of inotify watches
+        if verbose:
+            print("inotify not available (%s), polling every %.1f s: %s" % (e, interval, dir))
+        return PollingWatcher(dir, exts, recursive, interval)
+
+
+def watch_files(watcher, settle=SETTLE_TIME):
+    # yields lists of FileEntry of new files, each file once its size and mtime were stable for settle seconds
+    pending = {}  # path -> (size, mtime_ns, time of the last change)
+    while True:
+        now = time.monotonic()
+        for path in watcher.read(settle / 2 if pending else None):
+            pending[path] = (None, None, now)
+
+        now = time.monotonic()
+        batch = []
+        for path, (size, mtime_ns, t_change) in list(pending.items()):
+            try:
+                st = os.stat(path)
+            except OSError:
+                del pending[path]  # removed or moved away again
+                continue
+            if (st.st_size, st.st_mtime_ns) != (size, mtime_ns):
+                pending[path] = (st.st_size, st.st_mtime_ns, now)
+            elif now - t_change >= settle:
+                del pending[path]
+                batch.append(FileEntry(path))
+        if batch:
+            batch.sort(key=lambda entry: entry.path)
+            yield batch
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# Software License Agreement (GNU GPLv3  License)
+#
+# Copyright (c) 2022, Roland Jung (rolandjung0@gmail.com)
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Requirements:
+# sudo pip install Pillow tqdm argparse
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from py_image_modifier.common import exit_success, exit_failure
+from py_image_modifier.exif import read_exif_datetime
+from py_image_modifier.discovery import get_files_with_ext
+
+
+def get_exif(fn):
+    # returns the full Pillow EXIF dictionary {tag name: value} or None
+    from PIL import Image
+    from PIL.ExifTags import TAGS
+
+    try:
+        with Image.open(fn) as img:
+            info = img._getexif()
+    except Exception:
+        return None
+    if info is None:
+        return None
+    return dict((TAGS.get(tag, tag), value) for tag, value in info.items())
+
+
+def pillow_datetime(fn):
+    # the previous path of the rename-img timestamp: full Pillow EXIF dictionary
+    exif = get_exif(fn)
+    if exif is not None:
+        return exif.get("DateTimeOriginal", exif.get("DateTime"))
+    return None
+
+
+def header_datetime(fn):
+    datetime_str, parsed = read_exif_datetime(fn)
+    return datetime_str
+
+
+def run_benchmark(name, func, file_list):
+    t_start = time.perf_counter()
+    results = [func(fn) for fn in file_list]
+    duration = time.perf_counter() - t_start
+    print("%-8s: %d files in %.3f s -> %.1f files/s" % (name, len(file_list), duration, len(file_list) / duration))
+    return results
+
+
+# --input_dir ./test/in --ext jpg --copies 5000
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Compares the header-only EXIF timestamp reader against Pillow:\n usage: --input_dir ./test/in --ext jpg --copies 5000')
+    parser.add_argument('--input_dir', help='directory with images', default="")
+    parser.add_argument('--ext', help='file extension(s), case-insensitive, e.g. jpg,jpeg', default='jpg')
+    parser.add_argument('--copies', help='benchmark on <N> copies of the found images in a temporary directory',
+                        type=int, default=0)
+    args = parser.parse_args()
+
+    if args.input_dir == "" or not os.path.isdir(args.input_dir):
+        print("is not a directory %s" % args.input_dir)
+        exit_failure()
+
+    file_list = get_files_with_ext(os.path.abspath(args.input_dir), args.ext, False, True)
+    if not file_list:
+        print("no files found!")
+        exit_failure()
+
+    tmp_dir = None
+    if args.copies > 0:
+        tmp_dir = tempfile.mkdtemp()
+        sources = file_list
+        file_list = []
+        for i in range(args.copies):
+            src = sources[i % len(sources)]
+            file_list.append(shutil.copy(src, os.path.join(tmp_dir, "%06d%s" % (i, os.path.splitext(src)[1]))))
+
+    try:
+        # warm up the page cache:
+        run_benchmark("warm-up", header_datetime, file_list)
+        results_pillow = run_benchmark("pillow", pillow_datetime, file_list)
+        results_header = run_benchmark("header", header_datetime, file_list)
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir)
+
+    mismatches = sum(1 for a, b in zip(results_pillow, results_header) if a != b)
+    print("mismatching timestamps: %d" % mismatches)
+    if mismatches:
+        exit_failure()
+    exit_success()
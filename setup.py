@@ -36,4 +36,6 @@ setup(
     packages=find_packages(exclude=["test_*", "TODO*"]),
     python_requires='>=3.6',
     install_requires=['argparse', 'Pillow', 'tqdm'],
+    extras_require={'heif': ['pillow-heif']},
+    entry_points={'console_scripts': ['py_image_modifier = py_image_modifier.cli:main']},
 )